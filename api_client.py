@@ -1,6 +1,8 @@
 import os
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
@@ -32,8 +34,24 @@ class AffiliateAPIClient:
             'Content-Type': 'application/json'
         }
         
-        # Timeout per le richieste
-        self.timeout = 30
+        # Timeout per le richieste (connessione, lettura): un host irraggiungibile fallisce subito
+        self.timeout = (5, 30)
+        
+        # Sessione condivisa: riusa le connessioni keep-alive verso l'API
+        # (il thread del bot e quello del cronjob usano lo stesso pool)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Le sole GET vengono ritentate su errori transitori del gateway; le scritture mai
+        retry = Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         logger.info(f"🔧 AffiliateAPIClient inizializzato - URL: {self.api_url}")
     
@@ -58,10 +76,9 @@ class AffiliateAPIClient:
         try:
             logger.debug(f"🌐 {method} {endpoint}")
             
-            response = requests.request(
+            response = self.session.request(
                 method=method,
                 url=url,
-                headers=self.headers,
                 json=data if data else None,
                 params=params if params else None,
                 timeout=self.timeout
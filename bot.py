@@ -1,10 +1,16 @@
 import os
 import logging
 import re
+import random
 import threading
 import time
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from typing import List, Dict, Any
+from urllib.parse import urlsplit, urlunsplit
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import telebot
 from telebot import types
@@ -13,7 +19,9 @@ from telebot import types
 telebot_logger = logging.getLogger('TeleBot')
 telebot_logger.setLevel(logging.WARNING)  # Only show WARNING and ERROR, not INFO
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.parser import HTMLParser
 from fake_useragent import UserAgent
 from database import DatabaseManager
 from translation_manager import TranslationManager
@@ -28,6 +36,165 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Pattern link Amazon accettati (amazon.<tld>, amzn.to, a.co)
+_AMAZON_URL_RE = re.compile(
+    r'https?://(?:www\.)?(?:amazon\.[a-z]{2,3}(?:\.[a-z]{2})?|amzn\.to|a\.co)/.*',
+    re.IGNORECASE
+)
+
+# Percentuale di sconto ("-23%") e prezzo ("139,90€") estratti dalla pagina prodotto
+_DISCOUNT_RE = re.compile(r'-(\d+)%')
+_PRICE_RE = re.compile(r'(\d+(?:,\d+)?)\s*€')
+
+# Nodi letti dalla pagina prodotto, raccolti con un'unica visita del DOM
+_PRODUCT_PAGE_SELECTOR = ', '.join([
+    'meta[name="title"]',
+    'span#productTitle',
+    'img#landingImage',
+    'span.savingsPercentage.a-color-price',
+    'span.priceToPay',
+    'span.basisPrice'
+])
+
+# Limiti di invio Telegram: ~30 messaggi/s in totale e ~20 messaggi/minuto per gruppo o canale
+_GLOBAL_SEND_INTERVAL = 1 / 30
+_CHAT_SEND_INTERVAL = 3.0
+
+# Endpoint OpenAI e numero massimo di messaggi migliorati tenuti in memoria
+_OPENAI_CHAT_COMPLETIONS_URL = 'https://api.openai.com/v1/chat/completions'
+_OPENAI_CACHE_SIZE = 4096
+
+# Numero massimo di URL immagine rifiutati da Telegram tenuti in memoria
+_BAD_IMAGE_URLS_SIZE = 2048
+
+# Numero massimo di pagine prodotto con validatori HTTP tenute in memoria (LRU)
+_PAGE_CACHE_SIZE = 1024
+
+# Descrizioni degli errori 400 dovuti all'immagine stessa (non a caption troppo lunga o HTML non valido)
+_BAD_IMAGE_ERRORS = (
+    'wrong file identifier/http url specified',
+    'failed to get http url content',
+    'wrong type of the web page content',
+    'image_process_failed',
+    'photo_invalid_dimensions'
+)
+
+# Tabelle di escape per i parse_mode di Telegram (una sola passata con str.translate)
+_MARKDOWN_ESCAPE_TABLE = str.maketrans({char: f'\\{char}' for char in '_*[]()~`>#+-=|{}.!'})
+_HTML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;'
+})
+
+# Tastiere di navigazione fisse: (emoji, chiave di traduzione, callback_data) per ogni riga
+_NAV_KEYBOARDS = {
+    'purchase_nav': (
+        ("⚙️ ", 'modifica_testo', 'start_purchase_button_config'),
+        ("🏠 ", 'menu_principale', 'back_to_main_menu'),
+    ),
+    'purchase_saved_nav': (
+        ("⚙️ ", 'configura_pulsante', 'show_purchase_button_config'),
+        ("🏠 ", 'menu_principale', 'back_to_main_menu'),
+    ),
+    'prompt_nav': (
+        ("🧪 ", 'testa_prompt', 'test_prompt'),
+        ("⚙️ ", 'modifica_prompt', 'start_prompt_config'),
+        ("🏠 ", 'menu_principale', 'back_to_main_menu'),
+    ),
+    'no_prompt_nav': (
+        ("➕ ", 'configura_prompt', 'start_prompt_config'),
+        ("🏠 ", 'menu_principale', 'back_to_main_menu'),
+    ),
+    'test_products_nav': (
+        ("🔙 ", 'torna_alle_categorie', 'test_prompt'),
+        ("❌ ", 'annulla', 'cancel_test_prompt'),
+    ),
+    'language_back_nav': (
+        ("", 'back', 'back_to_main_menu'),
+    ),
+    'language_changed_nav': (
+        ("", 'main_menu', 'back_to_main_menu'),
+    ),
+}
+
+# Suffisso " - Amazon.it" nei titoli e ASIN nei link /dp/
+_AMAZON_TITLE_SUFFIX_RE = re.compile(r'\s*-\s*Amazon\.[a-z]{2,3}.*$')
+_ASIN_RE = re.compile(r'/dp/([A-Z0-9]{10})')
+
+# Pulizia del messaggio inviato al gruppo (righe link e righe vuote extra)
+_PRODUCT_LINK_LINE_RE = re.compile(r'🔗\s*[Ll]ink\s+prodotto\s*:\s*\S+')
+_LINK_LINE_RE = re.compile(r'🔗\s*[Ll]ink\s*:\s*\S+')
+_EXTRA_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+def _truncate(text: str, limit: int = 50) -> str:
+    """Accorcia il testo a limit caratteri aggiungendo "..." solo se serve (un solo confronto)"""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+@lru_cache(maxsize=8192)
+def _url_with_affiliate_tag(amazon_url: str, affiliate_tag: str) -> str:
+    """Aggiunge il tag alla query string, prima dell'eventuale #frammento (funzione pura, memorizzata)"""
+    parts = urlsplit(amazon_url)
+    query = f"{parts.query}&tag={affiliate_tag}" if parts.query else f"tag={affiliate_tag}"
+    return urlunsplit(parts._replace(query=query))
+
+@lru_cache(maxsize=64)
+def _channel_link_to_chat_id(channel_link: str) -> str:
+    """Converte un link di canale/gruppo nel chat_id accettato dall'API Telegram (funzione pura, memorizzata)"""
+    # Se è già un chat ID numerico (inizia con -), restituiscilo così com'è
+    if channel_link.startswith('-') and channel_link[1:].isdigit():
+        return channel_link
+    
+    # Se è un link t.me, estrae il nome del canale
+    if 't.me/' in channel_link:
+        # Estrae la parte dopo t.me/
+        channel_name = channel_link.split('t.me/')[-1]
+        # Rimuove eventuali parametri URL
+        channel_name = channel_name.split('?')[0].split('#')[0]
+        # Aggiunge @ se non c'è già
+        if not channel_name.startswith('@'):
+            channel_name = f'@{channel_name}'
+        return channel_name
+    
+    # Se inizia già con @, restituiscilo così com'è
+    if channel_link.startswith('@'):
+        return channel_link
+    
+    # Altrimenti, assumiamo sia un nome canale e aggiungiamo @
+    return f'@{channel_link}'
+
+class _UserStateCache(TTLCache):
+    """TTLCache per gli stati utente, con accessi serializzati tra i thread degli handler"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        # Rientrante: pop e get passano a loro volta da __getitem__/__delitem__
+        self._lock = threading.RLock()
+    
+    def __getitem__(self, key):
+        # Anche la lettura riordina i link interni del TTLCache
+        with self._lock:
+            return super().__getitem__(key)
+    
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+    
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+    
+    def get(self, key, default=None):
+        with self._lock:
+            return super().get(key, default)
+    
+    def pop(self, key, *default):
+        # Controllo e rimozione atomici: due cancel concorrenti non sollevano KeyError
+        with self._lock:
+            return super().pop(key, *default)
+
 class AffiliateAPI:
     def __init__(self):
         self.license_code = os.getenv('LICENSE_CODE')
@@ -80,10 +247,10 @@ class AmazonBot:
         
         # Parse authorized users
         authorized_users_str = os.getenv('AUTHORIZED_USERS', '')
-        self.authorized_users = []
+        self.authorized_users = frozenset()
         if authorized_users_str:
             try:
-                self.authorized_users = [int(user_id.strip()) for user_id in authorized_users_str.split(',') if user_id.strip()]
+                self.authorized_users = frozenset(int(user_id.strip()) for user_id in authorized_users_str.split(',') if user_id.strip())
             except ValueError:
                 logger.error("Error parsing authorized users from .env file")
         
@@ -91,8 +258,9 @@ class AmazonBot:
             raise ValueError("BOT_TOKEN not found in .env file")
         
         # Inizializza bot e database
-        self.bot = telebot.TeleBot(self.bot_token)
-        self.db = DatabaseManager("dummy") 
+        # Più worker per gli handler: le chiamate bloccanti a Telegram di utenti diversi si sovrappongono
+        self.bot = telebot.TeleBot(self.bot_token, num_threads=4)
+        self.db = DatabaseManager()
         
         # Inizializza il sistema di traduzioni
         self.translator = TranslationManager()
@@ -102,16 +270,93 @@ class AmazonBot:
         
         # Configurazione OpenAI
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        
-        # Dizionario per tracciare gli stati degli utenti durante l'inserimento categorie
-        self.user_states: Dict[int, Dict[str, Any]] = {}
+        # Modello per il miglioramento dei messaggi (es. gpt-4o-mini: più economico e veloce)
+        self.openai_model = os.getenv('OPENAI_MODEL', 'gpt-4')
+        # Messaggi già migliorati, per (prompt, messaggio originale): LRU condiviso tra cronjob e handler
+        self._openai_cache: OrderedDict = OrderedDict()
+        self._openai_cache_lock = threading.Lock()
+        # Sessione persistente verso l'API OpenAI: connessione TLS riusata e retry con backoff su 429/5xx;
+        # mai su timeout di lettura o connessione caduta (la richiesta potrebbe essere già elaborata e fatturata)
+        self._openai_session = requests.Session()
+        self._openai_session.mount('https://', HTTPAdapter(
+            pool_maxsize=4,
+            max_retries=Retry(
+                total=3,
+                connect=3,
+                read=0,
+                other=0,
+                status=3,
+                backoff_factor=1,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=frozenset({'POST'})
+            )
+        ))
+        self._openai_session.headers.update({'Authorization': f"Bearer {self.openai_api_key}"})
+        # Worker per le chiamate OpenAI avviate in anticipo dal cronjob
+        self._openai_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='openai')
+        # Scraping dei test prompt, avviato prima delle chiamate Telegram del handler
+        self._prompt_test_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prompt-test')
+        # Risultati di scraping dei test prompt per URL: test ripetuti sullo stesso prodotto non rifanno la richiesta
+        self._prompt_test_scrapes = TTLCache(maxsize=256, ttl=300)
+        self._prompt_test_scrapes_lock = threading.Lock()
+        
+        # Immagini prodotto rifiutate da Telegram: i prossimi invii passano subito al solo testo
+        self._bad_image_urls: OrderedDict = OrderedDict()
+        self._bad_image_urls_lock = threading.Lock()
+        
+        # Stati degli utenti durante i flussi guidati: scadono dopo 30 minuti se il flusso viene abbandonato
+        self.user_states: Dict[int, Dict[str, Any]] = _UserStateCache(maxsize=10_000, ttl=1800)
         
         # Thread per il cronjob di controllo prezzi
         self.cronjob_thread = None
         self.cronjob_running = False
+        # Evento di stop del run corrente: interrompe subito le pause del cronjob (uno nuovo per ogni avvio)
+        self._stop_event = threading.Event()
+        
+        # Prenotazione degli slot di invio verso canali e gruppi (evita gli errori 429)
+        self._send_lock = threading.Lock()
+        self._next_send_at: Dict[Any, float] = {}
+        self._next_global_send_at = 0.0
         
-        # User agent per web scraping
+        # User agent per web scraping: pool pre-generato, estratto a ogni richiesta
         self.user_agent = UserAgent()
+        self._ua_pool = tuple(self.user_agent.random for _ in range(32))
+        
+        # Validatori HTTP (ETag/Last-Modified) e ultimo risultato per URL, per le GET condizionali (LRU limitata)
+        self._page_cache: OrderedDict = OrderedDict()
+        self._page_cache_lock = threading.Lock()
+        
+        # Ultima schermata disegnata per chat: (message_id, edit_date, impronta), per saltare le modifiche identiche
+        self._last_render: Dict[int, tuple] = {}
+        
+        # Rimozioni admin in attesa di conferma: user_id chiamante -> (admin_user_id, istante della verifica)
+        self._pending_admin_removals: Dict[int, tuple] = {}
+        
+        # Tastiere "annulla" già costruite, per (callback_data, lingua)
+        self._cancel_keyboards: Dict[tuple, types.InlineKeyboardMarkup] = {}
+        # Keyboard dell'approvazione automatica, per (abilitata, lingua)
+        self._auto_approval_keyboards: Dict[tuple, types.InlineKeyboardMarkup] = {}
+        # Tastiere di navigazione di _NAV_KEYBOARDS, per (nome, lingua)
+        self._nav_keyboards: Dict[tuple, types.InlineKeyboardMarkup] = {}
+        # Schermata di scelta lingua (testo, tastiera), per lingua corrente (le lingue disponibili sono fisse)
+        self._language_screens: Dict[str, tuple] = {}
+        
+        # Sessione HTTP persistente per lo scraping (riusa le connessioni keep-alive)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 503])
+        )
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            'Accept-Language': 'it-IT,it;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1'
+        })
         
         # Registra i handlers
         self.register_handlers()
@@ -133,49 +378,121 @@ class AmazonBot:
     
     def get_text(self, key: str, **kwargs) -> str:
         """Helper method per ottenere testi tradotti"""
+        if not kwargs:
+            # Caso più frequente: lookup diretto nel dizionario già in memoria
+            return self.translator.translations.get(key, key)
         return self.translator.get_text(key, **kwargs)
     
     def escape_markdown(self, text: str) -> str:
         """Escape caratteri speciali per Markdown V2"""
-        special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
-        escaped_text = text
-        for char in special_chars:
-            escaped_text = escaped_text.replace(char, f'\\{char}')
-        return escaped_text
+        return text.translate(_MARKDOWN_ESCAPE_TABLE)
     
     def escape_html(self, text: str) -> str:
         """Escape caratteri speciali per HTML"""
         if not text:
             return ""
-        return (text.replace('&', '&amp;')
-                    .replace('<', '&lt;')
-                    .replace('>', '&gt;')
-                    .replace('"', '&quot;')
-                    .replace("'", '&#x27;'))
+        return text.translate(_HTML_ESCAPE_TABLE)
+    
+    def _safe_edit_or_send(self, call, text: str, parse_mode: str = None, reply_markup=None,
+                           disable_web_page_preview: bool = None):
+        """Aggiorna il messaggio della callback (testo o didascalia in base al contenuto), altrimenti ne invia uno nuovo"""
+        message = call.message
+        chat_id = message.chat.id
+        
+        # Impronta di testo + pulsanti: se il messaggio non è cambiato dall'ultima modifica, evita la chiamata
+        buttons = tuple(
+            (button.text, button.callback_data, button.url)
+            for row in (reply_markup.keyboard if reply_markup else ())
+            for button in row
+        )
+        fingerprint = hash((text, parse_mode, buttons))
+        if self._last_render.get(chat_id) == (message.message_id, message.edit_date, fingerprint):
+            return
+        
+        try:
+            if message.content_type in ('photo', 'video', 'document', 'animation'):
+                edited = self.bot.edit_message_caption(
+                    caption=text,
+                    chat_id=chat_id,
+                    message_id=message.message_id,
+                    parse_mode=parse_mode,
+                    reply_markup=reply_markup
+                )
+            else:
+                edited = self.bot.edit_message_text(
+                    text,
+                    chat_id,
+                    message.message_id,
+                    parse_mode=parse_mode,
+                    reply_markup=reply_markup,
+                    disable_web_page_preview=disable_web_page_preview
+                )
+            if getattr(edited, 'edit_date', None):
+                self._last_render[chat_id] = (message.message_id, edited.edit_date, fingerprint)
+        except telebot.apihelper.ApiTelegramException as e:
+            if 'message is not modified' in e.description:
+                return  # Contenuto già aggiornato
+            logger.debug(f"Edit failed, sending new message: {e}")
+            self._last_render.pop(chat_id, None)
+            self.bot.send_message(
+                chat_id,
+                text,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup,
+                disable_web_page_preview=disable_web_page_preview
+            )
+    
+    def _cancel_keyboard(self, callback_data: str):
+        """Tastiera con il solo bottone annulla, costruita una volta per callback e lingua"""
+        key = (callback_data, self.translator.get_current_language())
+        keyboard = self._cancel_keyboards.get(key)
+        if keyboard is None:
+            keyboard = types.InlineKeyboardMarkup()
+            keyboard.add(types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data=callback_data))
+            self._cancel_keyboards[key] = keyboard
+        return keyboard
+    
+    def _nav_keyboard(self, name: str):
+        """Tastiera di navigazione fissa di _NAV_KEYBOARDS, costruita una volta per nome e lingua"""
+        key = (name, self.translator.get_current_language())
+        keyboard = self._nav_keyboards.get(key)
+        if keyboard is None:
+            keyboard = types.InlineKeyboardMarkup([
+                [types.InlineKeyboardButton(emoji + self.get_text(text_key), callback_data=callback_data)]
+                for emoji, text_key, callback_data in _NAV_KEYBOARDS[name]
+            ])
+            self._nav_keyboards[key] = keyboard
+        return keyboard
+    
+    def _wait_for_send_slot(self, chat_id):
+        """Attende il prossimo slot di invio libero per la chat, rispettando i limiti di Telegram"""
+        with self._send_lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_global_send_at, self._next_send_at.get(chat_id, 0.0))
+            self._next_global_send_at = send_at + _GLOBAL_SEND_INTERVAL
+            self._next_send_at[chat_id] = send_at + _CHAT_SEND_INTERVAL
+        
+        delay = send_at - now
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _with_flood_retry(self, send, *args, **kwargs):
+        """Esegue un invio verso canale o gruppo; su 429 sposta lo slot globale di retry_after secondi e riprova una volta"""
+        try:
+            return send(*args, **kwargs)
+        except telebot.apihelper.ApiTelegramException as e:
+            if e.error_code != 429:
+                raise
+            retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+            logger.warning(f"Telegram flood limit hit, retrying in {retry_after}s")
+            with self._send_lock:
+                self._next_global_send_at = max(self._next_global_send_at, time.monotonic() + retry_after)
+            time.sleep(retry_after)
+            return send(*args, **kwargs)
     
     def convert_channel_link_to_chat_id(self, channel_link: str) -> str:
         """Converte un link del canale nel formato corretto per l'API Telegram"""
-        # Se è già un chat ID numerico (inizia con -), restituiscilo così com'è
-        if channel_link.startswith('-') and channel_link[1:].isdigit():
-            return channel_link
-        
-        # Se è un link t.me, estrae il nome del canale
-        if 't.me/' in channel_link:
-            # Estrae la parte dopo t.me/
-            channel_name = channel_link.split('t.me/')[-1]
-            # Rimuove eventuali parametri URL
-            channel_name = channel_name.split('?')[0].split('#')[0]
-            # Aggiunge @ se non c'è già
-            if not channel_name.startswith('@'):
-                channel_name = f'@{channel_name}'
-            return channel_name
-        
-        # Se inizia già con @, restituiscilo così com'è
-        if channel_link.startswith('@'):
-            return channel_link
-        
-        # Altrimenti, assumiamo sia un nome canale e aggiungiamo @
-        return f'@{channel_link}'
+        return _channel_link_to_chat_id(channel_link)
     
     def register_handlers(self):
         """Registra tutti gli handlers del bot"""
@@ -455,7 +772,7 @@ class AmazonBot:
                         try:
                             category_id = int(parts[3])
                             page = int(parts[4])
-                            self.show_category_products(call.message.chat.id, category_id, page, call.message.message_id)
+                            self.show_category_products(call.message.chat.id, category_id, page, call)
                             category = self.db.get_category_by_id(category_id)
                             category_name = category[1] if category else "Categoria"
                             self.bot.answer_callback_query(call.id, f"📂 {category_name} - " + self.get_text('pagina') + " " + str(page + 1))
@@ -494,22 +811,20 @@ class AmazonBot:
                 
                 elif call.data == 'start_amazon_config':
                     # Inizia configurazione Amazon (edit message)
-                    self.start_amazon_affiliate_configuration_edit(call)
                     self.bot.answer_callback_query(call.id, self.get_text('configurazione_amazon'))
+                    self.start_amazon_affiliate_configuration_edit(call)
                 
                 elif call.data == 'cancel_cronjob_config':
                     # Annulla configurazione cronjob
                     user_id = call.from_user.id
-                    if user_id in self.user_states:
-                        del self.user_states[user_id]
+                    self.user_states.pop(user_id, None)
                     self.show_cronjob_menu_edit(call)
                     self.bot.answer_callback_query(call.id, self.get_text('configurazione_annullata'))
                 
                 elif call.data == 'cancel_channel_config':
                     # Annulla configurazione canale
                     user_id = call.from_user.id
-                    if user_id in self.user_states:
-                        del self.user_states[user_id]
+                    self.user_states.pop(user_id, None)
                     self.show_channel_config_edit(call)
                     self.bot.answer_callback_query(call.id, self.get_text('configurazione_annullata'))
                 
@@ -519,8 +834,7 @@ class AmazonBot:
                 elif call.data == 'cancel_amazon_config':
                     # Annulla configurazione Amazon
                     user_id = call.from_user.id
-                    if user_id in self.user_states:
-                        del self.user_states[user_id]
+                    self.user_states.pop(user_id, None)
                     self.show_amazon_config_edit(call)
                     self.bot.answer_callback_query(call.id, self.get_text('configurazione_annullata'))
                 
@@ -530,8 +844,7 @@ class AmazonBot:
                 elif call.data == 'cancel_telegram_link_config':
                     # Annulla configurazione link telegram
                     user_id = call.from_user.id
-                    if user_id in self.user_states:
-                        del self.user_states[user_id]
+                    self.user_states.pop(user_id, None)
                     self.show_categories_for_telegram_link_edit(call)
                     self.bot.answer_callback_query(call.id, self.get_text('configurazione_annullata'))
                 
@@ -557,8 +870,7 @@ class AmazonBot:
                 elif call.data == 'cancel_admin_config':
                     # Annulla configurazione admin
                     user_id = call.from_user.id
-                    if user_id in self.user_states:
-                        del self.user_states[user_id]
+                    self.user_states.pop(user_id, None)
                     self.show_admin_management_edit(call)
                     self.bot.answer_callback_query(call.id, self.get_text('configurazione_annullata'))
                 
@@ -615,8 +927,8 @@ class AmazonBot:
                 logger.error(f"Full traceback: {traceback.format_exc()}")
                 try:
                     self.bot.answer_callback_query(call.id, self.get_text('errore_interno'))
-                except:
-                    pass
+                except telebot.apihelper.ApiTelegramException:
+                    pass  # Callback già risposta o scaduta
         
         @self.bot.message_handler(func=lambda message: True)
         def handle_all_messages(message):
@@ -629,24 +941,26 @@ class AmazonBot:
             self.db.update_user_activity(user_id)
             
             # Controlla se l'utente è in un processo di aggiunta categoria, prodotto, link Telegram, configurazione cronjob o canale
-            if user_id in self.user_states:
-                if self.user_states[user_id]['action'] == 'adding_category':
+            user_state = self.user_states.get(user_id)
+            if user_state:
+                action = user_state['action']
+                if action == 'adding_category':
                     self.handle_category_input(message)
-                elif self.user_states[user_id]['action'] == 'adding_product':
+                elif action == 'adding_product':
                     self.handle_product_input(message)
-                elif self.user_states[user_id]['action'] == 'adding_telegram_link':
+                elif action == 'adding_telegram_link':
                     self.handle_telegram_link_input(message)
-                elif self.user_states[user_id]['action'] == 'configuring_cronjob':
+                elif action == 'configuring_cronjob':
                     self.handle_cronjob_configuration_input(message)
-                elif self.user_states[user_id]['action'] == 'configuring_channel':
+                elif action == 'configuring_channel':
                     self.handle_channel_configuration_input(message)
-                elif self.user_states[user_id]['action'] == 'configuring_prompt':
+                elif action == 'configuring_prompt':
                     self.handle_prompt_configuration_input(message)
-                elif self.user_states[user_id]['action'] == 'configuring_amazon_affiliate':
+                elif action == 'configuring_amazon_affiliate':
                     self.handle_amazon_affiliate_configuration_input(message)
-                elif self.user_states[user_id]['action'] == 'adding_admin':
+                elif action == 'adding_admin':
                     self.handle_add_admin_input(message)
-                elif self.user_states[user_id]['action'] == 'configuring_purchase_button':
+                elif action == 'configuring_purchase_button':
                     self.handle_purchase_button_configuration_input(message)
                 return
             
@@ -665,6 +979,11 @@ class AmazonBot:
         categories = self.db.get_all_categories()
         
         if categories:
+            # Testi invarianti nel ciclo
+            link_label = self.get_text('link_telegram')
+            created_label = self.get_text('creata')
+            delete_label = self.get_text('elimina')
+            
             # Invia un messaggio per ogni categoria esistente
             for cat_id, name, description, telegram_link, created_by, created_at in categories:
                 # Escape caratteri speciali per Markdown
@@ -675,13 +994,13 @@ class AmazonBot:
                 category_text += f"📝 {escaped_desc}\n"
                 if telegram_link:
                     escaped_link = self.escape_markdown(telegram_link)
-                    category_text += self.get_text('link_telegram')+": {escaped_link}\n"
-                category_text += self.get_text('creata')+": {created_at[:16]}"
+                    category_text += f"{link_label}: {escaped_link}\n"
+                category_text += f"{created_label}: {created_at[:16]}"
                 
                 # Keyboard con pulsante elimina
                 keyboard = types.InlineKeyboardMarkup()
                 delete_btn = types.InlineKeyboardButton(
-                    self.get_text('elimina'), 
+                    delete_label, 
                     callback_data=f"delete_category_{cat_id}"
                 )
                 keyboard.add(delete_btn)
@@ -797,8 +1116,8 @@ class AmazonBot:
                 self.bot.reply_to(
                     message,
                     f"✅ *" + self.get_text('categoria_creata_con_successo') + "!*\n\n"
-                    f"📂 " + self.get_text('nome_categoria_creata') + ": {escaped_name}\n"
-                    f"📝 " + self.get_text('descrizione_categoria_creata') + ": {escaped_desc}",
+                    f"📂 {self.get_text('nome_categoria_creata')}: {escaped_name}\n"
+                    f"📝 {self.get_text('descrizione_categoria_creata')}: {escaped_desc}",
                     parse_mode='Markdown'
                 )
                 
@@ -814,15 +1133,14 @@ class AmazonBot:
                 )
             
             # Rimuovi lo stato utente
-            del self.user_states[user_id]
+            self.user_states.pop(user_id, None)
     
     def cancel_add_category_process(self, call):
         """Annulla il processo di aggiunta categoria"""
         user_id = call.from_user.id
         
         # Rimuovi lo stato utente se esiste
-        if user_id in self.user_states:
-            del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
         
         # Torna al menu categorie
         self.show_categories_menu_edit(call)
@@ -838,9 +1156,10 @@ class AmazonBot:
         
         cat_id, name, description, telegram_link, created_by, created_at = category
         
-        confirm_text = f"🗑 *" + self.get_text('conferma_eliminazione') + "*\n\n"
-        confirm_text += f"📂 " + self.get_text('nome') + ": {name}\n"
-        confirm_text += f"📝 " + self.get_text('descrizione') + ": {description}\n\n"
+        # HTML con escape: nome e descrizione sono testo libero dell'utente
+        confirm_text = f"🗑 <b>{self.get_text('conferma_eliminazione')}</b>\n\n"
+        confirm_text += f"📂 {self.get_text('nome')}: {self.escape_html(name)}\n"
+        confirm_text += f"📝 {self.get_text('descrizione')}: {self.escape_html(description)}\n\n"
         confirm_text += "⚠️ " + self.get_text('questa_azione_non_può_essere_annullata')
         
         keyboard = types.InlineKeyboardMarkup()
@@ -858,7 +1177,7 @@ class AmazonBot:
             confirm_text,
             call.message.chat.id,
             call.message.message_id,
-            parse_mode='Markdown',
+            parse_mode='HTML',
             reply_markup=keyboard
         )
     
@@ -883,32 +1202,9 @@ class AmazonBot:
             back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('torna_alle_categorie') + "", callback_data="show_categories")
             keyboard.add(back_btn)
             
-            try:
-                self.bot.edit_message_text(
-                    success_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                try:
-                    self.bot.edit_message_caption(
-                        call.message.chat.id,
-                        call.message.message_id,
-                        caption=success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-            
             self.bot.answer_callback_query(call.id, "✅ " + self.get_text('categoria_eliminata') + "")
+            self._safe_edit_or_send(call, success_text, parse_mode='HTML', reply_markup=keyboard)
+            
             self.db.log_interaction(call.from_user.id, 'delete_category', f"{self.get_text('categoria')}: {name}")
             logger.info(f"Category '{name}' deleted by user {call.from_user.id}")
         else:
@@ -924,11 +1220,12 @@ class AmazonBot:
         
         # Crea keyboard con categorie + conteggio prodotti
         keyboard = types.InlineKeyboardMarkup(row_width=1)
+        products_label = self.get_text('prodotti')
         
         for cat_id, name, description, telegram_link, created_by, created_at in categories:
             # Conta prodotti in questa categoria
             products_count = len(self.db.get_products_by_category(cat_id))
-            button_text = f"📂 {name} (" + str(products_count) + " " + self.get_text('prodotti') + ")"
+            button_text = f"📂 {name} (" + str(products_count) + " " + products_label + ")"
             callback_data = f"view_category_products_{cat_id}_0"  # _0 per pagina 0
             button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
             keyboard.add(button)
@@ -947,7 +1244,7 @@ class AmazonBot:
             reply_markup=keyboard
         )
     
-    def show_category_products(self, chat_id: int, category_id: int, page: int = 0, message_id: int = None):
+    def show_category_products(self, chat_id: int, category_id: int, page: int = 0, call=None):
         """Mostra prodotti di una categoria con paginazione"""
         category = self.db.get_category_by_id(category_id)
         if not category:
@@ -974,33 +1271,8 @@ class AmazonBot:
             keyboard.add(add_btn)
             keyboard.add(back_btn)
             
-            if message_id:
-                try:
-                    self.bot.edit_message_text(
-                        no_products_text,
-                        chat_id,
-                        message_id,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e:
-                    # Se fallisce edit_message_text, prova con edit_message_caption
-                    try:
-                        self.bot.edit_message_caption(
-                            chat_id,
-                            message_id,
-                            caption=no_products_text,
-                            parse_mode='HTML',
-                            reply_markup=keyboard
-                        )
-                    except Exception as e2:
-                        # Fallback: invia nuovo messaggio
-                        self.bot.send_message(
-                            chat_id,
-                            no_products_text,
-                            parse_mode='HTML',
-                            reply_markup=keyboard
-                        )
+            if call:
+                self._safe_edit_or_send(call, no_products_text, 'HTML', keyboard)
             else:
                 self.bot.send_message(
                     chat_id,
@@ -1023,10 +1295,11 @@ class AmazonBot:
         
         # Keyboard con prodotti
         keyboard = types.InlineKeyboardMarkup(row_width=1)
+        default_title = self.get_text('prodotto_amazon')
         
         for product_id, amazon_url, title, added_by, created_at in current_products:
             # Accorcia il titolo se troppo lungo
-            display_title = title[:50] + "..." if title and len(title) > 50 else (title or self.get_text('prodotto_amazon'))
+            display_title = _truncate(title) if title else default_title
             button_text = f"🛒 " + display_title
             callback_data = f"view_product_{product_id}"
             button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
@@ -1060,33 +1333,8 @@ class AmazonBot:
         keyboard.add(add_btn)
         keyboard.add(back_btn)
         
-        if message_id:
-            try:
-                self.bot.edit_message_text(
-                    products_text,
-                    chat_id,
-                    message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                # Se fallisce edit_message_text, prova con edit_message_caption
-                try:
-                    self.bot.edit_message_caption(
-                        chat_id,
-                        message_id,
-                        caption=products_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    # Fallback: invia nuovo messaggio
-                    self.bot.send_message(
-                        chat_id,
-                        products_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
+        if call:
+            self._safe_edit_or_send(call, products_text, 'HTML', keyboard)
         else:
             self.bot.send_message(
                 chat_id,
@@ -1104,11 +1352,12 @@ class AmazonBot:
         
         # Crea keyboard con categorie + conteggio prodotti
         keyboard = types.InlineKeyboardMarkup(row_width=1)
+        products_label = self.get_text('prodotti')
         
         for cat_id, name, description, telegram_link, created_by, created_at in categories:
             # Conta prodotti in questa categoria
             products_count = len(self.db.get_products_by_category(cat_id))
-            button_text = f"📂 {name} (" + str(products_count) + " " + self.get_text('prodotti') + ")"
+            button_text = f"📂 {name} (" + str(products_count) + " " + products_label + ")"
             callback_data = f"view_category_products_{cat_id}_0"  # _0 per pagina 0
             button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
             keyboard.add(button)
@@ -1124,33 +1373,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                menu_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            # Se fallisce edit_message_text, prova con edit_message_caption
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=menu_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                # Fallback: invia nuovo messaggio
-                self.bot.send_message(
-                    call.message.chat.id,
-                    menu_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "📦 " + self.get_text('menu_prodotti'))
+        self._safe_edit_or_send(call, menu_text, parse_mode='HTML', reply_markup=keyboard)
     
     def show_product_details(self, call, product_id: int):
         """Mostra dettagli di un prodotto specifico"""
@@ -1218,32 +1442,7 @@ class AmazonBot:
                     reply_markup=keyboard
                 )
         else:
-            try:
-                self.bot.edit_message_text(
-                    details_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                # Se fallisce edit_message_text, prova con edit_message_caption
-                try:
-                    self.bot.edit_message_caption(
-                        call.message.chat.id,
-                        call.message.message_id,
-                        caption=details_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    # Fallback: invia nuovo messaggio
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        details_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
+            self._safe_edit_or_send(call, details_text, parse_mode='HTML', reply_markup=keyboard)
         
         self.bot.answer_callback_query(call.id, f"📦 " + (title or self.get_text('prodotto'))[:30] + "...")
     
@@ -1275,33 +1474,8 @@ class AmazonBot:
         keyboard.add(confirm_btn)
         keyboard.add(cancel_btn)
         
-        try:
-            self.bot.edit_message_text(
-                confirm_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            # Se fallisce edit_message_text, prova con edit_message_caption
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=confirm_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                # Fallback: invia nuovo messaggio
-                self.bot.send_message(
-                    call.message.chat.id,
-                    confirm_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "⚠️ " + self.get_text('conferma_eliminazione'))
+        self._safe_edit_or_send(call, confirm_text, parse_mode='HTML', reply_markup=keyboard)
     
     def delete_product_final(self, call, product_id: int):
         """Elimina definitivamente il prodotto"""
@@ -1333,32 +1507,7 @@ class AmazonBot:
             keyboard.add(back_btn)
             keyboard.add(menu_btn)
             
-            try:
-                self.bot.edit_message_text(
-                    success_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                # Se fallisce edit_message_text, prova con edit_message_caption
-                try:
-                    self.bot.edit_message_caption(
-                        call.message.chat.id,
-                        call.message.message_id,
-                        caption=success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    # Fallback: invia nuovo messaggio
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
+            self._safe_edit_or_send(call, success_text, parse_mode='HTML', reply_markup=keyboard)
             
             self.db.log_interaction(call.from_user.id, 'delete_product', f'Prodotto: {title or "N/A"} (ID: {product_id})')
             logger.info(f"Product {product_id} deleted by user {call.from_user.id}")
@@ -1423,33 +1572,7 @@ class AmazonBot:
         language_btn = types.InlineKeyboardButton(self.get_text('language_settings'), callback_data="language_settings")
         keyboard.add(language_btn)
         
-        try:
-            self.bot.edit_message_text(
-                help_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard,
-                disable_web_page_preview=True
-            )
-        except Exception as e:
-            # Se fallisce edit_message_text, prova con edit_message_caption
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=help_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                # Fallback: invia nuovo messaggio
-                self.bot.send_message(
-                    call.message.chat.id,
-                    help_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+        self._safe_edit_or_send(call, help_text, 'HTML', keyboard, disable_web_page_preview=True)
         self.bot.answer_callback_query(call.id, "📖 "+ self.get_text('menu_principale'))
     
     def show_categories_menu_edit(self, call):
@@ -1457,13 +1580,17 @@ class AmazonBot:
         categories = self.db.get_all_categories()
         
         if categories:
-            categories_text = "📂 <b>" + self.get_text('gestione_categorie') + "</b>\n\n"
-            categories_text += f"📊 <b>" + self.get_text('categorie_total') + ": " + str(len(categories)) + "</b>\n\n"
-            categories_text += self.get_text('clicca_su_una_categoria_per_visualizzarne_i_dettagli') + ":"
+            categories_text = (
+                f"📂 <b>{self.get_text('gestione_categorie')}</b>\n\n"
+                f"📊 <b>{self.get_text('categorie_total')}: {len(categories)}</b>\n\n"
+                f"{self.get_text('clicca_su_una_categoria_per_visualizzarne_i_dettagli')}:"
+            )
         else:
-            categories_text = "📂 <b>" + self.get_text('gestione_categorie') + "</b>\n\n"
-            categories_text += "❌ <b>" + self.get_text('nessuna_categoria_presente') + "</b>\n\n"
-            categories_text += self.get_text('aggiungi_la_prima_categoria_per_iniziare')
+            categories_text = (
+                f"📂 <b>{self.get_text('gestione_categorie')}</b>\n\n"
+                f"❌ <b>{self.get_text('nessuna_categoria_presente')}</b>\n\n"
+                f"{self.get_text('aggiungi_la_prima_categoria_per_iniziare')}"
+            )
         
         # Keyboard con bottoni per ogni categoria
         keyboard = types.InlineKeyboardMarkup(row_width=1)
@@ -1482,31 +1609,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                categories_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=categories_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    categories_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "📂 "+ self.get_text('categorie'))
+        self._safe_edit_or_send(call, categories_text, parse_mode='HTML', reply_markup=keyboard)
     
     def show_category_details(self, call, category_id: int):
         """Mostra i dettagli di una categoria singola con opzione elimina"""
@@ -1521,18 +1625,16 @@ class AmazonBot:
         # Conta i prodotti in questa categoria
         products_count = len(self.db.get_products_by_category(category_id))
         
-        details_text = f"📂 <b>" + self.get_text('dettagli_categoria') + "</b>\n\n" 
-        details_text += f"🏷️ <b>" + self.get_text('nome') + ":</b> " + self.escape_html(name) + "\n"
-        details_text += f"📝 <b>" + self.get_text('descrizione') + ":</b> " + self.escape_html(description) + "\n"
-        
-        if telegram_link:
-            details_text += f"🔗 <b>" + self.get_text('link_telegram') + ":</b> " + self.escape_html(telegram_link) + "\n"
-        else:
-            details_text += f"🔗 <b>" + self.get_text('link_telegram') + ":</b> " + self.get_text('non_configurato') + "\n"
-        
-        details_text += f"📦 <b>" + self.get_text('prodotti') + ":</b> " + str(products_count) + "\n"
-        details_text += f"📅 <b>" + self.get_text('creata_il') + ":</b> " + created_at[:16] + "\n"
-        details_text += f"👤 <b>" + self.get_text('creata_da') + ":</b> " + str(created_by) + "\n"
+        link_value = self.escape_html(telegram_link) if telegram_link else self.get_text('non_configurato')
+        details_text = (
+            f"📂 <b>{self.get_text('dettagli_categoria')}</b>\n\n"
+            f"🏷️ <b>{self.get_text('nome')}:</b> {self.escape_html(name)}\n"
+            f"📝 <b>{self.get_text('descrizione')}:</b> {self.escape_html(description)}\n"
+            f"🔗 <b>{self.get_text('link_telegram')}:</b> {link_value}\n"
+            f"📦 <b>{self.get_text('prodotti')}:</b> {products_count}\n"
+            f"📅 <b>{self.get_text('creata_il')}:</b> {created_at[:16]}\n"
+            f"👤 <b>{self.get_text('creata_da')}:</b> {created_by}\n"
+        )
         
         # Keyboard con opzioni
         keyboard = types.InlineKeyboardMarkup()
@@ -1545,31 +1647,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('torna_alle_categorie'), callback_data="show_categories")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                details_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=details_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    details_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, f"📂 {name}")
+        self._safe_edit_or_send(call, details_text, parse_mode='HTML', reply_markup=keyboard)
     
     def show_categories_for_telegram_link_edit(self, call):
         """Mostra le categorie disponibili per assegnare link Telegram (edit message)"""
@@ -1580,13 +1659,15 @@ class AmazonBot:
         
         # Crea keyboard con le categorie
         keyboard = types.InlineKeyboardMarkup(row_width=1)
+        existing_link_label = self.get_text('link_esistente')
+        no_link_label = self.get_text('nessun_link')
         
         for cat_id, name, description, telegram_link, created_by, created_at in categories:
             # Indica se la categoria ha già un link
             if telegram_link:
-                button_text = f"🔗 {name} (" + self.get_text('link_esistente') + ")"
+                button_text = f"🔗 {name} (" + existing_link_label + ")"
             else:
-                button_text = f"📂 {name} (" + self.get_text('nessun_link') + ")"
+                button_text = f"📂 {name} (" + no_link_label + ")"
             
             callback_data = f"link_category_{cat_id}"
             button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
@@ -1596,31 +1677,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                menu_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=menu_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    menu_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "🔗 "+ self.get_text('link_categorie'))
+        self._safe_edit_or_send(call, menu_text, parse_mode='HTML', reply_markup=keyboard)
     
     def check_channel_before_cronjob(self, call):
         """Controlla se c'è un canale database configurato prima di mostrare il menu cronjob"""
@@ -1711,31 +1769,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "⏰ " + self.get_text('cronjob'))
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
     
     def show_channel_config_edit(self, call):
         """Mostra configurazione canale database (edit message)"""
@@ -1772,31 +1807,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "📢 "+ self.get_text('canale_database'))
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
     
     def show_amazon_config_edit(self, call):
         """Mostra configurazione slug Amazon (edit message)"""
@@ -1834,31 +1846,8 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "🔗 "+ self.get_text('slug_amazon'))
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
     
     def show_prompt_config_edit(self, call):
         """Mostra configurazione prompt AI (edit message)"""
@@ -1895,30 +1884,7 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
         
         # Se c'è un prompt configurato, invia il prompt completo in un messaggio separato
         if config and prompt_text:
@@ -1926,13 +1892,7 @@ class AmazonBot:
             prompt_message += f"<code>" + self.escape_html(prompt_text) + "</code>"
             
             # Keyboard per il messaggio del prompt
-            keyboard_prompt = types.InlineKeyboardMarkup()
-            test_btn = types.InlineKeyboardButton("🧪 " + self.get_text('testa_prompt'), callback_data="test_prompt")
-            modify_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('modifica_prompt'), callback_data="start_prompt_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard_prompt.add(test_btn)
-            keyboard_prompt.add(modify_btn)
-            keyboard_prompt.add(menu_btn)
+            keyboard_prompt = self._nav_keyboard('prompt_nav')
             
             # Invia il messaggio del prompt separatamente
             try:
@@ -1985,44 +1945,19 @@ class AmazonBot:
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "🔗 " + self.get_text('slug_amazon'))
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
 
     def is_valid_amazon_url(self, url: str) -> bool:
         """Valida se l'URL è un link Amazon valido"""
-        amazon_patterns = [
-            r'https?://(?:www\.)?amazon\.[a-z]{2,3}(?:\.[a-z]{2})?/.*',
-            r'https?://(?:www\.)?amzn\.to/.*',
-            r'https?://(?:www\.)?a\.co/.*'
-        ]
-        
-        for pattern in amazon_patterns:
-            if re.match(pattern, url, re.IGNORECASE):
-                return True
-        return False
+        # Scarta subito testo libero e link non Amazon senza invocare la regex
+        lowered = url.lower()
+        if not lowered.startswith(('http://', 'https://')):
+            return False
+        if 'amazon.' not in lowered and 'amzn.to/' not in lowered and 'a.co/' not in lowered:
+            return False
+
+        return _AMAZON_URL_RE.match(url) is not None
     
     def extract_product_title_from_url(self, url: str) -> str:
         """Estrae il titolo del prodotto dall'URL Amazon utilizzando web scraping"""
@@ -2034,12 +1969,12 @@ class AmazonBot:
             # Se il titolo è valido e diverso dal fallback generico, usalo
             if title and title != self.get_text('prodotto_amazon') and len(title.strip()) > 0:
                 # Pulisci il titolo rimuovendo " - Amazon.it" e simili se presenti
-                title = re.sub(r'\s*-\s*Amazon\.[a-z]{2,3}.*$', '', title)
+                title = _AMAZON_TITLE_SUFFIX_RE.sub('', title)
                 return title.strip()
             
             # Fallback: prova a estrarre l'ASIN dall'URL per un titolo generico più informativo
             if 'dp/' in url:
-                asin_match = re.search(r'/dp/([A-Z0-9]{10})', url)
+                asin_match = _ASIN_RE.search(url)
                 if asin_match:
                     return f"{self.get_text('prodotto_amazon')} ({asin_match.group(1)})"
             
@@ -2049,7 +1984,7 @@ class AmazonBot:
             # Fallback: prova almeno con l'ASIN
             try:
                 if 'dp/' in url:
-                    asin_match = re.search(r'/dp/([A-Z0-9]{10})', url)
+                    asin_match = _ASIN_RE.search(url)
                     if asin_match:
                         return f"{self.get_text('prodotto_amazon')} ({asin_match.group(1)})"
             except:
@@ -2092,34 +2027,8 @@ class AmazonBot:
         )
         keyboard.add(cancel_btn)
         
-        try:
-            self.bot.edit_message_text(
-                add_product_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            # Se fallisce edit_message_text, prova con edit_message_caption
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=add_product_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                # Fallback: invia nuovo messaggio
-                self.bot.send_message(
-                    call.message.chat.id,
-                    add_product_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-        
         self.bot.answer_callback_query(call.id, "➕ " + self.get_text('aggiungi_prodotto'))
+        self._safe_edit_or_send(call, add_product_text, parse_mode='HTML', reply_markup=keyboard)
     
     def handle_product_input(self, message):
         """Gestisce l'input dell'utente durante l'aggiunta prodotto"""
@@ -2154,7 +2063,7 @@ class AmazonBot:
             )
             
             # Rimuovi lo stato utente
-            del self.user_states[user_id]
+            self.user_states.pop(user_id, None)
             
             # Mostra selezione categoria
             if user_state.get('from_edit', False):
@@ -2179,7 +2088,7 @@ class AmazonBot:
         
         selection_text = f"✅ *" + self.get_text('prodotto_aggiunto_con_successo') + "!*\n\n"
         selection_text += f"🛒 " + product_title + "\n"
-        selection_text += f"🔗 " + amazon_url[:50] + "'...' if len(amazon_url) > 50 else ''" + "\n\n"
+        selection_text += f"🔗 {_truncate(amazon_url)}\n\n"
         selection_text += "📂 *" + self.get_text('seleziona_la_categoria_per_questo_prodotto') + ":*"
         
         # Crea keyboard con le categorie
@@ -2204,7 +2113,7 @@ class AmazonBot:
         
         selection_text = f"✅ <b>" + self.get_text('prodotto_aggiunto_con_successo') + "!</b>\n\n"
         selection_text += f"🛒 " + self.escape_html(product_title) + "\n"
-        selection_text += f"🔗 " + self.escape_html(amazon_url[:50]) + ("..." if len(amazon_url) > 50 else "") + "\n\n"
+        selection_text += f"🔗 {self.escape_html(_truncate(amazon_url))}\n\n"
         selection_text += "📂 <b>" + self.get_text('seleziona_la_categoria_per_questo_prodotto') + ":</b>"
         
         # Crea keyboard con le categorie
@@ -2226,63 +2135,41 @@ class AmazonBot:
     
     def assign_product_to_category(self, call, product_id: int, category_id: int):
         """Assegna un prodotto a una categoria"""
-        # Ottieni informazioni prodotto e categoria
-        product = self.db.get_product_by_id(product_id)
-        category = self.db.get_category_by_id(category_id)
-        
-        if not product or not category:
+        if not self.db.update_product_category(product_id, category_id):
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('prodotto_o_categoria_non_trovati'))
             return
         
-        # Aggiorna categoria del prodotto
-        success = self.db.update_product_category(product_id, category_id)
+        # La riga prodotto include già il nome della categoria (join lato API)
+        product = self.db.get_product_by_id(product_id)
         
-        if success:
+        # Aggiungi pulsante per tornare al menu prodotti
+        keyboard = types.InlineKeyboardMarkup()
+        back_button = types.InlineKeyboardButton("🔙 " + self.get_text('torna_al_menu_prodotti'), callback_data="back_to_products_menu")
+        keyboard.add(back_button)
+        
+        if product:
             product_title = product[2] if product[2] else self.get_text('prodotto_amazon')
-            category_name = category[1]
+            category_name = product[7]
             
             success_text = f"✅ <b>" + self.get_text('prodotto_assegnato_alla_categoria') + "!</b>\n\n"
             success_text += f"🛒 " + self.escape_html(product_title) + "\n"
             success_text += f"📂 " + self.get_text('categoria') + ": <b>" + self.escape_html(category_name) + "</b>\n\n"
             success_text += f"🔗 " + self.escape_html(product[1])
             
-            # Aggiungi pulsante per tornare al menu prodotti
-            keyboard = types.InlineKeyboardMarkup()
-            back_button = types.InlineKeyboardButton("🔙 " + self.get_text('torna_al_menu_prodotti'), callback_data="back_to_products_menu")
-            keyboard.add(back_button)
-            
-            try:
-                self.bot.edit_message_text(
-                    success_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                # Se fallisce edit_message_text, prova con edit_message_caption
-                try:
-                    self.bot.edit_message_caption(
-                        call.message.chat.id,
-                        call.message.message_id,
-                        caption=success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    # Fallback: invia nuovo messaggio
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-            
             self.bot.answer_callback_query(call.id, "✅ " + self.get_text('prodotto_assegnato_alla_categoria'))
+            self._safe_edit_or_send(call, success_text, parse_mode='HTML', reply_markup=keyboard)
             self.db.log_interaction(call.from_user.id, 'assign_category', f"{self.get_text('prodotto')} {product_id} -> {self.get_text('categoria')} {category_name}")
             logger.info(f"{self.get_text('prodotto')} {product_id} {self.get_text('assegnato_alla_categoria')} {category_name} {self.get_text('da_utente')} {call.from_user.id}")
         else:
-            self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_nell_assegnazione'))
+            # Assegnazione riuscita ma riga non riletta: conferma senza i dettagli del prodotto
+            self.bot.answer_callback_query(call.id, "✅ " + self.get_text('prodotto_assegnato_alla_categoria'))
+            self._safe_edit_or_send(
+                call,
+                f"✅ <b>{self.get_text('prodotto_assegnato_alla_categoria')}!</b>",
+                parse_mode='HTML',
+                reply_markup=keyboard
+            )
+            self.db.log_interaction(call.from_user.id, 'assign_category', f"{self.get_text('prodotto')} {product_id} -> {self.get_text('categoria')} {category_id}")
     
     # Metodi per gestire i link Telegram delle categorie
     def show_categories_for_telegram_link(self, chat_id: int):
@@ -2294,13 +2181,15 @@ class AmazonBot:
         
         # Crea keyboard con le categorie
         keyboard = types.InlineKeyboardMarkup(row_width=1)
+        existing_link_label = self.get_text('link_esistente')
+        no_link_label = self.get_text('nessun_link')
         
         for cat_id, name, description, telegram_link, created_by, created_at in categories:
             # Indica se la categoria ha già un link
             if telegram_link:
-                button_text = f"🔗 {name} (" + self.get_text('link_esistente') + ")"
+                button_text = f"🔗 {name} (" + existing_link_label + ")"
             else:
-                button_text = f"📂 {name} (" + self.get_text('nessun_link') + ")"
+                button_text = f"📂 {name} (" + no_link_label + ")"
             
             callback_data = f"link_category_{cat_id}"
             button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
@@ -2349,36 +2238,10 @@ class AmazonBot:
             link_text += f"\n💡 " + self.get_text('invia_il_link_del_gruppo_telegram_per_questa_categoria') + ":"
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_telegram_link_config")
-        keyboard.add(cancel_btn)
-        
-        try:
-            self.bot.edit_message_text(
-                link_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=link_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    link_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+        keyboard = self._cancel_keyboard('cancel_telegram_link_config')
         
         self.bot.answer_callback_query(call.id, f"✅ " + self.get_text('selezionata_categoria') + ": " + name)
+        self._safe_edit_or_send(call, link_text, parse_mode='HTML', reply_markup=keyboard)
     
     def handle_telegram_link_input(self, message):
         """Gestisce l'input del link Telegram dall'utente"""
@@ -2425,7 +2288,7 @@ class AmazonBot:
             )
         
         # Rimuovi lo stato utente
-        del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
     
     # Metodi per gestire il cronjob
     def show_cronjob_config(self, chat_id: int, user_id: int):
@@ -2504,34 +2367,9 @@ class AmazonBot:
         config_text += f"📝 " + self.get_text('invia_un_numero_intero') + ":"
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_cronjob_config")
-        keyboard.add(cancel_btn)
+        keyboard = self._cancel_keyboard('cancel_cronjob_config')
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
     
     def handle_cronjob_configuration_input(self, message):
         """Gestisce l'input per la configurazione cronjob"""
@@ -2561,18 +2399,18 @@ class AmazonBot:
             user_state['check_interval'] = value
             user_state['step'] = 'product_delay'
             
-            step2_text = f"✅ " + self.get_text('intervallo_controllo') + ": <b>" + value + " minuti</b>\n\n"
-            step2_text += f"⏱ " + self.get_text('ora_inserisci_quanti_minuti_di_pausa_devono_passare_tra_lanalisi_di_un_prodotto_e_il_successivo') + ":\n\n"
-            step2_text += f"💡 " + self.get_text('esempi') + ":\n"
-            step2_text += f"• 1 = " + self.get_text('1_minuto_di_pausa') + "\n"
-            step2_text += f"• 2 = " + self.get_text('2_minuti_di_pausa') + "\n"
-            step2_text += f"• 5 = " + self.get_text('5_minuti_di_pausa') + "\n\n"
-            step2_text += f"⚠️ " + self.get_text('pausa_più_lunga_=_meno_rischio_di_essere_bloccati_da_amazon')
+            step2_text = (
+                f"✅ {self.get_text('intervallo_controllo')}: <b>{value} minuti</b>\n\n"
+                f"⏱ {self.get_text('ora_inserisci_quanti_minuti_di_pausa_devono_passare_tra_lanalisi_di_un_prodotto_e_il_successivo')}:\n\n"
+                f"💡 {self.get_text('esempi')}:\n"
+                f"• 1 = {self.get_text('1_minuto_di_pausa')}\n"
+                f"• 2 = {self.get_text('2_minuti_di_pausa')}\n"
+                f"• 5 = {self.get_text('5_minuti_di_pausa')}\n\n"
+                f"⚠️ {self.get_text('pausa_più_lunga_=_meno_rischio_di_essere_bloccati_da_amazon')}"
+            )
             
             # Keyboard con bottone annulla
-            keyboard = types.InlineKeyboardMarkup()
-            cancel_btn = types.InlineKeyboardButton(f"❌ " + self.get_text('annulla'), callback_data="cancel_cronjob_config")
-            keyboard.add(cancel_btn)
+            keyboard = self._cancel_keyboard('cancel_cronjob_config')
             
             self.bot.reply_to(
                 message,
@@ -2602,10 +2440,10 @@ class AmazonBot:
             if success:
                 self.bot.reply_to(
                     message,
-                    f"✅ *" + self.get_text('configurazione_salvata') + "!*\n\n"
-                    f"🔄 " + self.get_text('controllo_ogni') + ": *" + check_interval + " minuti*\n"
-                    f"⏱ " + self.get_text('pausa_tra_prodotti') + ": *" + value + " minuti*\n\n"
-                    f"💡 " + self.get_text('usa_il_pulsante_qui_sotto_per_modificare_la_configurazione') + "!",
+                    f"✅ *{self.get_text('configurazione_salvata')}!*\n\n"
+                    f"🔄 {self.get_text('controllo_ogni')}: *{check_interval} minuti*\n"
+                    f"⏱ {self.get_text('pausa_tra_prodotti')}: *{value} minuti*\n\n"
+                    f"💡 {self.get_text('usa_il_pulsante_qui_sotto_per_modificare_la_configurazione')}!",
                     parse_mode='Markdown'
                 )
                 
@@ -2619,13 +2457,14 @@ class AmazonBot:
                 )
             
             # Rimuovi stato utente
-            del self.user_states[user_id]
+            self.user_states.pop(user_id, None)
     
     def toggle_cronjob(self, call):
         """Attiva o disattiva il cronjob"""
         config = self.db.get_cronjob_config()
         
         if not config:
+            self.bot.answer_callback_query(call.id)
             self.bot.edit_message_text(
                 "❌ *" + self.get_text('cronjob_non_configurato') + "*\n\n" + self.get_text('prima_configura_gli_intervalli_usando_il_pulsante_configura_intervalli') + ".",
                 call.message.chat.id,
@@ -2637,35 +2476,41 @@ class AmazonBot:
         check_interval, product_delay, is_active, last_run, created_by = config
         new_status = not is_active
         
-        # Aggiorna stato nel database
-        success = self.db.update_cronjob_config(
-            check_interval=check_interval,
-            product_delay=product_delay,
-            is_active=new_status,
-            created_by=created_by
-        )
+        # Aggiorna stato nel database (solleva eccezione se l'API non salva)
+        try:
+            self.db.update_cronjob_config(
+                check_interval=check_interval,
+                product_delay=product_delay,
+                is_active=new_status,
+                created_by=created_by
+            )
+        except Exception as e:
+            logger.error(f"Error updating cronjob status: {e}")
+            self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_nell_aggiornamento'))
+            return
         
-        if success:
-            if new_status:
-                # Avvia cronjob
-                self.start_price_monitoring_thread()
-                self.bot.answer_callback_query(call.id, "✅ " + self.get_text('cronjob_attivato'))
-                self.db.log_interaction(call.from_user.id, 'start_cronjob', "{self.get_text('cronjob_avviato')}")
-                logger.info(f"Cronjob started by user {call.from_user.id}")
-            else:
-                # Ferma cronjob
-                self.stop_price_monitoring_thread()
-                self.bot.answer_callback_query(call.id, "⏸ " + self.get_text('cronjob_fermato'))
-                self.db.log_interaction(call.from_user.id, 'stop_cronjob', "{self.get_text('cronjob_fermato')}")
-                logger.info(f"Cronjob stopped by user {call.from_user.id}")
-            
-            # Aggiorna il menu mantenendo i bottoni ma con lo status aggiornato
-            self.show_cronjob_menu_edit(call)
+        # Conferma la callback solo dopo il salvataggio riuscito
+        if new_status:
+            self.bot.answer_callback_query(call.id, "✅ " + self.get_text('cronjob_attivato'))
+            # Avvia cronjob
+            self.start_price_monitoring_thread()
+            self.db.log_interaction(call.from_user.id, 'start_cronjob', self.get_text('cronjob_avviato'))
+            logger.info(f"Cronjob started by user {call.from_user.id}")
         else:
-            self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_nell_aggiornamento'))
+            self.bot.answer_callback_query(call.id, "⏸ " + self.get_text('cronjob_fermato'))
+            # Ferma cronjob
+            self.stop_price_monitoring_thread()
+            self.db.log_interaction(call.from_user.id, 'stop_cronjob', self.get_text('cronjob_fermato'))
+            logger.info(f"Cronjob stopped by user {call.from_user.id}")
+        
+        # Aggiorna il menu mantenendo i bottoni ma con lo status aggiornato
+        self.show_cronjob_menu_edit(call)
     
     def show_cronjob_status(self, call):
         """Mostra stato dettagliato del cronjob"""
+        # Risponde subito alla callback, prima delle letture dal database
+        self.bot.answer_callback_query(call.id, "📊 " + self.get_text('stato_dettagliato'))
+        
         config = self.db.get_cronjob_config()
         
         if not config:
@@ -2673,155 +2518,91 @@ class AmazonBot:
         else:
             check_interval, product_delay, is_active, last_run, created_by = config
             
-            status_text = f"📊 *" + self.get_text('stato_dettagliato_cronjob') + "*\n\n"
-            status_text += f"🔄 " + self.get_text('controllo_ogni') + ": " + str(check_interval) + " " + self.get_text('minuti') + "\n" 
-            status_text += f"⏱ " + self.get_text('pausa_tra_prodotti') + ": " + str(product_delay) + " " + self.get_text('minuti') + "\n"
-            status_text += f"📊 Status: {'✅ ' + self.get_text('attivo') if is_active else '❌ ' + self.get_text('inattivo')}\n"
-            
-            if last_run:
-                status_text += f"🕒 " + self.get_text('ultima_esecuzione') + ": " + str(last_run[:16]) + "\n"
+            minutes = self.get_text('minuti')
+            active_text = f"✅ {self.get_text('attivo')}" if is_active else f"❌ {self.get_text('inattivo')}"
+            last_run_text = f"🕒 {self.get_text('ultima_esecuzione')}: {last_run[:16]}\n" if last_run else ""
             
             # Informazioni thread
             if self.cronjob_running:
-                status_text += f"🧵 Thread: ✅ " + self.get_text('in_esecuzione') + "\n"
+                thread_text = f"✅ {self.get_text('in_esecuzione')}"
             else:
-                status_text += f"🧵 Thread: ❌ " + self.get_text('fermo') + "\n"
+                thread_text = f"❌ {self.get_text('fermo')}"
             
             # Conta prodotti
             products = self.db.get_all_products()
-            status_text += f"📦 " + self.get_text('prodotti_monitorati') + ": " + str(len(products)) + "\n"
+            
+            status_text = (
+                f"📊 *{self.get_text('stato_dettagliato_cronjob')}*\n\n"
+                f"🔄 {self.get_text('controllo_ogni')}: {check_interval} {minutes}\n"
+                f"⏱ {self.get_text('pausa_tra_prodotti')}: {product_delay} {minutes}\n"
+                f"📊 Status: {active_text}\n"
+                f"{last_run_text}"
+                f"🧵 Thread: {thread_text}\n"
+                f"📦 {self.get_text('prodotti_monitorati')}: {len(products)}\n"
+            )
         
         # Keyboard con bottone indietro
         keyboard = types.InlineKeyboardMarkup()
         back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('torna_al_cronjob'), callback_data="show_cronjob_menu")
         keyboard.add(back_btn)
         
-        try:
-            self.bot.edit_message_text(
-                status_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='Markdown',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=status_text,
-                    parse_mode='Markdown',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    status_text,
-                    parse_mode='Markdown',
-                    reply_markup=keyboard
-                )
-        
-        self.bot.answer_callback_query(call.id, "📊 " + self.get_text('stato_dettagliato'))
+        self._safe_edit_or_send(call, status_text, parse_mode='Markdown', reply_markup=keyboard)
     
     # Metodi per il web scraping e monitoraggio prezzi
+    def _scrape_for_prompt_test(self, url: str) -> Dict[str, Any]:
+        """Scraping per il test prompt, riusando per 5 minuti il risultato dello stesso URL"""
+        with self._prompt_test_scrapes_lock:
+            cached = self._prompt_test_scrapes.get(url)
+        if cached is not None:
+            return cached
+        
+        result = self.scrape_amazon_product(url)
+        if 'error' not in result:
+            with self._prompt_test_scrapes_lock:
+                self._prompt_test_scrapes[url] = result
+        return result
+    
     def scrape_amazon_product(self, url: str) -> Dict[str, Any]:
         """Scraping di un prodotto Amazon per rilevare sconti e dettagli prodotto"""
         try:
-            headers = {
-                'User-Agent': self.user_agent.random,
-                'Accept-Language': 'it-IT,it;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Gli header statici sono sulla sessione, qui varia solo lo User-Agent
+            headers = {'User-Agent': random.choice(self._ua_pool)}
+            
+            # GET condizionale se la pagina ha già fornito ETag/Last-Modified
+            with self._page_cache_lock:
+                cached = self._page_cache.get(url)
+                if cached:
+                    self._page_cache.move_to_end(url)
+            if cached:
+                etag, last_modified, cached_result = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+            
+            response = self._session.get(url, headers=headers, timeout=(5, 15))
+            
+            if response.status_code == 304 and cached:
+                # Pagina invariata: riusa l'ultimo risultato senza riparsare
+                logger.debug(f"Not modified: {url}")
+                return cached_result
             
-            # Estrae il titolo del prodotto dal meta title
-            title = self.get_text('prodotto_amazon')
-            title_meta = soup.find('meta', {'name': 'title'})
-            if title_meta and title_meta.get('content'):
-                title = title_meta.get('content').strip()
-            else:
-                # Fallback: cerca il titolo nella pagina
-                title_element = soup.find('span', {'id': 'productTitle'})
-                if title_element:
-                    title = title_element.get_text(strip=True)
-            
-            # Estrae l'URL dell'immagine principale
-            image_url = None
-            img_element = soup.find('img', {'id': 'landingImage'})
-            if img_element:
-                image_url = img_element.get('src')
-                # Se non c'è src, prova con data-old-hires per l'immagine ad alta risoluzione
-                if not image_url:
-                    image_url = img_element.get('data-old-hires')
-            
-            # Cerca il div dello sconto
-            discount_element = soup.find('span', {
-                'class': lambda x: x and 'savingsPercentage' in x and 'a-color-price' in x
-            })
-            
-            result = {
-                'title': title,
-                'image_url': image_url,
-                'has_discount': False
-            }
-            
-            if not discount_element:
-                # Nessuno sconto trovato, ma restituisce comunque titolo e immagine
-                return result
-            
-            # Estrae percentuale sconto
-            discount_text = discount_element.get_text(strip=True)
-            discount_match = re.search(r'-(\d+)%', discount_text)
-            
-            if not discount_match:
-                return result
-            
-            discount_percentage = int(discount_match.group(1))
-            
-            # Cerca prezzo scontato (finale)
-            discounted_price_element = soup.find('span', {
-                'class': lambda x: x and 'priceToPay' in x
-            })
-            
-            discounted_price = "N/A"
-            if discounted_price_element:
-                price_text = discounted_price_element.get_text(strip=True)
-                # Estrae il prezzo (formato: 139,90€)
-                price_match = re.search(r'(\d+(?:,\d+)?)\s*€', price_text)
-                if price_match:
-                    discounted_price = price_match.group(1) + "€"
-            
-            # Cerca prezzo originale
-            original_price_element = soup.find('span', {
-                'class': lambda x: x and 'basisPrice' in x
-            })
-            
-            original_price = "N/A"
-            if original_price_element:
-                price_text = original_price_element.get_text(strip=True)
-                # Estrae il prezzo dal testo (formato: "Prezzo consigliato: 145,90€")
-                price_match = re.search(r'(\d+(?:,\d+)?)\s*€', price_text)
-                if price_match:
-                    original_price = price_match.group(1) + "€"
-            
-            # Verifica che entrambi i prezzi siano validi per considerarlo un vero sconto
-            if original_price != "N/A" and discounted_price != "N/A":
-                result.update({
-                    'has_discount': True,
-                    'discount_percentage': discount_percentage,
-                    'discounted_price': discounted_price,
-                    'original_price': original_price
-                })
-            else:
-                # Se manca il prezzo originale o scontato, non è un vero sconto
-                logger.info(f"{self.get_text('sconto_ignorato')}: " + self.get_text('prezzo_originale') + "='{original_price}', " + self.get_text('prezzo_scontato') + "='{discounted_price}'")
+            response.raise_for_status()
+            logger.debug(f"Fetched {url} (Content-Encoding: {response.headers.get('Content-Encoding', 'identity')})")
+            
+            # Passa i byte grezzi: il parser rileva da solo il charset
+            result = self._parse_amazon_page(response.content)
+            
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            with self._page_cache_lock:
+                if etag or last_modified:
+                    self._page_cache[url] = (etag, last_modified, result)
+                    self._page_cache.move_to_end(url)
+                    if len(self._page_cache) > _PAGE_CACHE_SIZE:
+                        self._page_cache.popitem(last=False)
+                else:
+                    self._page_cache.pop(url, None)
             
             return result
             
@@ -2832,30 +2613,250 @@ class AmazonBot:
             logger.error(f"Error parsing {url}: {e}")
             return {'error': f"{self.get_text('errore_nel_parsing')}: " + str(e)}
     
-    def start_price_monitoring_thread(self):
+    def _parse_amazon_page(self, html: bytes) -> Dict[str, Any]:
+        """Estrae titolo, immagine e dati dello sconto dall'HTML di una pagina prodotto Amazon"""
+        tree = HTMLParser(html)
+        
+        # Una sola visita del DOM: smista i nodi trovati tenendo il primo per ogni tipo
+        nodes = {}
+        for node in tree.css(_PRODUCT_PAGE_SELECTOR):
+            attrs = node.attributes
+            classes = (attrs.get('class') or '').split()
+            if node.tag == 'meta':
+                key = 'title_meta'
+            elif node.tag == 'img':
+                key = 'image'
+            elif attrs.get('id') == 'productTitle':
+                key = 'title'
+            elif 'savingsPercentage' in classes:
+                key = 'discount'
+            elif 'priceToPay' in classes:
+                key = 'discounted_price'
+            else:
+                key = 'original_price'
+            nodes.setdefault(key, node)
+        
+        # Estrae il titolo del prodotto dal meta title
+        title = self.get_text('prodotto_amazon')
+        title_meta = nodes.get('title_meta')
+        if title_meta and title_meta.attributes.get('content'):
+            title = title_meta.attributes.get('content').strip()
+        else:
+            # Fallback: cerca il titolo nella pagina
+            title_element = nodes.get('title')
+            if title_element:
+                title = title_element.text(strip=True)
+        
+        # Estrae l'URL dell'immagine principale
+        image_url = None
+        img_element = nodes.get('image')
+        if img_element:
+            image_url = img_element.attributes.get('src')
+            # Se non c'è src, prova con data-old-hires per l'immagine ad alta risoluzione
+            if not image_url:
+                image_url = img_element.attributes.get('data-old-hires')
+        
+        # Cerca il div dello sconto
+        discount_element = nodes.get('discount')
+        
+        result = {
+            'title': title,
+            'image_url': image_url,
+            'has_discount': False
+        }
+        
+        if not discount_element:
+            # Nessuno sconto trovato, ma restituisce comunque titolo e immagine
+            return result
+        
+        # Estrae percentuale sconto
+        discount_text = discount_element.text(strip=True)
+        discount_match = _DISCOUNT_RE.search(discount_text)
+        
+        if not discount_match:
+            return result
+        
+        discount_percentage = int(discount_match.group(1))
+        
+        # Cerca prezzo scontato (finale)
+        discounted_price_element = nodes.get('discounted_price')
+        
+        discounted_price = "N/A"
+        if discounted_price_element:
+            price_text = discounted_price_element.text(strip=True)
+            # Estrae il prezzo (formato: 139,90€)
+            price_match = _PRICE_RE.search(price_text)
+            if price_match:
+                discounted_price = price_match.group(1) + "€"
+        
+        # Cerca prezzo originale
+        original_price_element = nodes.get('original_price')
+        
+        original_price = "N/A"
+        if original_price_element:
+            price_text = original_price_element.text(strip=True)
+            # Estrae il prezzo dal testo (formato: "Prezzo consigliato: 145,90€")
+            price_match = _PRICE_RE.search(price_text)
+            if price_match:
+                original_price = price_match.group(1) + "€"
+        
+        # Verifica che entrambi i prezzi siano validi per considerarlo un vero sconto
+        if original_price != "N/A" and discounted_price != "N/A":
+            result.update({
+                'has_discount': True,
+                'discount_percentage': discount_percentage,
+                'discounted_price': discounted_price,
+                'original_price': original_price
+            })
+        else:
+            # Se manca il prezzo originale o scontato, non è un vero sconto
+            logger.info(f"{self.get_text('sconto_ignorato')}: {self.get_text('prezzo_originale')}='{original_price}', {self.get_text('prezzo_scontato')}='{discounted_price}'")
+        
+        return result
+    
+    def start_price_monitoring_thread(self):
         """Avvia il thread per il monitoraggio prezzi"""
         if self.cronjob_running:
             logger.warning("Cronjob already running")
             return
         
         self.cronjob_running = True
-        self.cronjob_thread = threading.Thread(target=self.price_monitoring_loop, daemon=True)
+        # Evento proprio di questo run: un thread precedente ancora in chiusura resta fermato dal suo evento
+        self._stop_event = threading.Event()
+        self.cronjob_thread = threading.Thread(
+            target=self.price_monitoring_loop, args=(self._stop_event,), daemon=True
+        )
         self.cronjob_thread.start()
         logger.info("Thread cronjob started")
     
     def stop_price_monitoring_thread(self):
         """Ferma il thread per il monitoraggio prezzi"""
         self.cronjob_running = False
+        self._stop_event.set()
         if self.cronjob_thread and self.cronjob_thread.is_alive():
             logger.info("Stopping thread cronjob...")
         else:
             logger.info("Thread cronjob stopped")
     
-    def price_monitoring_loop(self):
-        """Loop principale del monitoraggio prezzi"""
+    def _check_product(self, product: tuple, scrape_result: Dict[str, Any] = None):
+        """Controlla un singolo prodotto: scraping, aggiornamento dettagli e notifica di eventuali sconti"""
+        product_id, amazon_url, title, image_url, category_id, added_by, created_at, category_name = product
+        
+        logger.info(f"Checking product {product_id}: {title or 'No title'}")
+        
+        # Scraping del prodotto (se non già eseguito dal chiamante)
+        if scrape_result is None:
+            scrape_result = self.scrape_amazon_product(amazon_url)
+        
+        if 'error' in scrape_result:
+            logger.error(f"Error scraping product {product_id}: {scrape_result['error']}")
+        else:
+            # Aggiorna titolo e immagine se necessario
+            scraped_title = scrape_result.get('title')
+            scraped_image = scrape_result.get('image_url')
+            
+            new_title = scraped_title if scraped_title and scraped_title != title else None
+            new_image = scraped_image if scraped_image and scraped_image != image_url else None
+            
+            # Un solo aggiornamento per titolo e immagine
+            if new_title or new_image:
+                self.db.update_product_details(product_id, title=new_title, image_url=new_image)
+                title = new_title or title  # Aggiorna per uso successivo
+                image_url = new_image or image_url
+            
+            # Controlla se c'è uno sconto
+            if scrape_result.get('has_discount', False):
+                # Prodotto in sconto
+                discount_percentage = scrape_result['discount_percentage']
+                original_price = scrape_result['original_price']
+                discounted_price = scrape_result['discounted_price']
+                
+                # Controlla se i dati sono cambiati
+                if self.db.discount_data_changed(product_id, discount_percentage, original_price, discounted_price):
+                    product_data = {
+                        'product': (product_id, amazon_url, title, image_url, category_id, added_by, created_at, category_name),
+                        'title': title,
+                        'image_url': image_url,
+                        'amazon_url': amazon_url,
+                        'category_name': category_name,
+                        'discount_percentage': discount_percentage,
+                        'original_price': original_price,
+                        'discounted_price': discounted_price
+                    }
+                    
+                    # Avvia subito la chiamata OpenAI (procede mentre si salva lo sconto), ma solo se
+                    # il canale di approvazione è attivo: altrimenti la notifica non verrà inviata
+                    channel_config = self.db.get_channel_config()
+                    improved_future = None
+                    if channel_config and channel_config[2]:  # is_active
+                        improved_future = self._openai_executor.submit(
+                            self.improve_message_with_openai, self._discount_original_message(product_data)
+                        )
+                        product_data['improved_future'] = improved_future
+                    
+                    # Salva nuovo sconto
+                    try:
+                        discount_id = self.db.add_product_discount(
+                            product_id=product_id,
+                            discount_percentage=discount_percentage,
+                            original_price=original_price,
+                            discounted_price=discounted_price
+                        )
+                    except Exception:
+                        if improved_future is not None:
+                            improved_future.cancel()  # Nessuna notifica senza sconto salvato
+                        raise
+                    
+                    logger.info(f"New discount found for product {product_id}: -{discount_percentage}%")
+                    
+                    # Invia notifica al canale di approvazione
+                    self.send_discount_notification(product_id, discount_id, product_data)
+                else:
+                    logger.debug(f"Discount unchanged for product {product_id}")
+            else:
+                logger.debug(f"No discount for product {product_id}")
+    
+    def _log_check_failure(self, product_id: int, future):
+        """Registra l'errore di un controllo prodotto eseguito nel worker"""
+        if not future.cancelled() and future.exception():
+            logger.error(f"Error checking product {product_id}: {future.exception()}")
+    
+    def _run_monitoring_cycle(self, product_delay: int, stop_event: threading.Event):
+        """Esegue un ciclo di controllo su tutti i prodotti monitorati"""
+        # Ottieni tutti i prodotti da monitorare
+        products = self.db.get_all_products()
+        
+        if not products:
+            logger.info("No products to monitor")
+        else:
+            logger.info(f"Starting check of {len(products)} products")
+            
+            # Lo scraping resta seriale e distanziato di product_delay (evita il blocco da Amazon);
+            # aggiornamenti DB e notifiche (OpenAI/Telegram) girano in un worker durante la pausa
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix='price-check') as executor:
+                for product in products:
+                    if stop_event.is_set():
+                        break
+                    
+                    scrape_result = self.scrape_amazon_product(product[1])  # amazon_url
+                    future = executor.submit(self._check_product, product, scrape_result)
+                    future.add_done_callback(partial(self._log_check_failure, product[0]))
+                    
+                    # Pausa tra prodotti (interrotta subito dallo stop)
+                    if stop_event.wait(product_delay * 60):  # Converti minuti in secondi
+                        break
+                
+                if stop_event.is_set():
+                    executor.shutdown(cancel_futures=True)
+        
+        # Aggiorna timestamp ultima esecuzione
+        self.db.update_cronjob_last_run()
+    
+    def price_monitoring_loop(self, stop_event: threading.Event):
+        """Loop principale del monitoraggio prezzi: pianifica un ciclo ogni check_interval minuti"""
         logger.info("Starting price monitoring loop")
         
-        while self.cronjob_running:
+        while not stop_event.is_set():
             try:
                 config = self.db.get_cronjob_config()
                 if not config or not config[2]:  # is_active
@@ -2864,170 +2865,69 @@ class AmazonBot:
                 
                 check_interval, product_delay, is_active, last_run, created_by = config
                 
-                # Ottieni tutti i prodotti da monitorare
-                products = self.db.get_all_products()
-                
-                if not products:
-                    logger.info("No products to monitor")
-                else:
-                    logger.info(f"Starting check of {len(products)} products")
-                    
-                    for product in products:
-                        if not self.cronjob_running:
-                            break
-                        
-                        product_id, amazon_url, title, image_url, category_id, added_by, created_at, category_name = product
-                        
-                        logger.info(f"Checking product {product_id}: {title or 'No title'}")
-                        
-                        # Scraping del prodotto
-                        scrape_result = self.scrape_amazon_product(amazon_url)
-                        
-                        if 'error' in scrape_result:
-                            logger.error(f"Error scraping product {product_id}: {scrape_result['error']}")
-                        else:
-                            # Aggiorna titolo e immagine se necessario
-                            scraped_title = scrape_result.get('title')
-                            scraped_image = scrape_result.get('image_url')
-                            
-                            if scraped_title and scraped_title != title:
-                                self.db.update_product_details(product_id, title=scraped_title)
-                                title = scraped_title  # Aggiorna per uso successivo
-                            
-                            if scraped_image and scraped_image != image_url:
-                                self.db.update_product_details(product_id, image_url=scraped_image)
-                                image_url = scraped_image  # Aggiorna per uso successivo
-                            
-                            # Controlla se c'è uno sconto
-                            if scrape_result.get('has_discount', False):
-                                # Prodotto in sconto
-                                discount_percentage = scrape_result['discount_percentage']
-                                original_price = scrape_result['original_price']
-                                discounted_price = scrape_result['discounted_price']
-                                
-                                # Controlla se i dati sono cambiati
-                                if self.db.discount_data_changed(product_id, discount_percentage, original_price, discounted_price):
-                                    # Salva nuovo sconto
-                                    discount_id = self.db.add_product_discount(
-                                        product_id=product_id,
-                                        discount_percentage=discount_percentage,
-                                        original_price=original_price,
-                                        discounted_price=discounted_price
-                                    )
-                                    
-                                    logger.info(f"New discount found for product {product_id}: -{discount_percentage}%")
-                                    
-                                    # Invia notifica al canale di approvazione
-                                    self.send_discount_notification(product_id, discount_id, {
-                                        'title': title,
-                                        'image_url': image_url,
-                                        'amazon_url': amazon_url,
-                                        'category_name': category_name,
-                                        'discount_percentage': discount_percentage,
-                                        'original_price': original_price,
-                                        'discounted_price': discounted_price
-                                    })
-                                else:
-                                    logger.debug(f"Discount unchanged for product {product_id}")
-                            else:
-                                logger.debug(f"No discount for product {product_id}")
-                        
-                        # Pausa tra prodotti
-                        if self.cronjob_running:
-                            time.sleep(product_delay * 60)  # Converti minuti in secondi
-                
-                # Aggiorna timestamp ultima esecuzione
-                self.db.update_cronjob_last_run()
+                self._run_monitoring_cycle(product_delay, stop_event)
                 
                 # Pausa prima del prossimo ciclo
-                if self.cronjob_running:
+                if not stop_event.is_set():
                     logger.info(f"Check completed, pause of {check_interval} minutes")
-                    time.sleep(check_interval * 60)  # Converti minuti in secondi
+                if stop_event.wait(check_interval * 60):  # Converti minuti in secondi
+                    break
                 
             except Exception as e:
                 logger.error(f"Error in price monitoring loop: {e}")
-                time.sleep(60)  # Pausa di 1 minuto in caso di errore
+                if stop_event.wait(60):  # Pausa di 1 minuto in caso di errore
+                    break
         
-        self.cronjob_running = False
+        # Solo il thread corrente segna il cronjob come fermo (non uno vecchio che termina dopo un riavvio)
+        if self.cronjob_thread is threading.current_thread():
+            self.cronjob_running = False
         logger.info("Price monitoring loop terminated")
     
     # Metodi per gestire il canale di approvazione
-    def start_channel_configuration_edit(self, call):
-        """Inizia il processo di configurazione canale (edit message)"""
-        user_id = call.from_user.id
-        config = self.db.get_channel_config()
+    def _channel_config_text(self, config, error_message: str = None) -> str:
+        """Costruisce il testo della schermata di configurazione canale (con errore opzionale)"""
+        title = self.get_text('configurazione_canale_approvazione')
+        error_text = f"❌ <b>{self.get_text('errore')}:</b> {error_message}\n\n" if error_message else ""
         
         if config:
             channel_link, channel_id, is_active, created_by = config
             status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
             
-            config_text = f"📢 <b>" + self.get_text('configurazione_canale_approvazione') + "</b>\n\n"
-            config_text += f"🆔 " + self.get_text('id_attuale') + ": <code>" + channel_link + "</code>\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"📢 <b>" + self.get_text('configurazione_canale_approvazione') + "</b>\n\n"
-            config_text += f"❌ " + self.get_text('nessun_canale_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione') + "\n\n"
-            config_text += f"⚠️ <b>" + self.get_text('importante') + ":</b> " + self.get_text('il_bot_deve_essere_già_amministratore_nel_canale') + "!\n\n"
-            config_text += f"💡 " + self.get_text('formato_esempio') + ": <code>-1001234567890</code> (" + self.get_text('id_numerico_del_canale_privato') + ")\n"
-            config_text += f"📍 " + self.get_text('come_trovare_l_id') + ": " + self.get_text('aggiungi_userinfobot_al_canale_e_scrivi_id')
-        
-        self.user_states[user_id] = {
-            'action': 'configuring_channel',
-            'chat_id': call.message.chat.id
-        }
-        
-        # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_channel_config")
-        keyboard.add(cancel_btn)
-        
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
+            return (
+                f"📢 <b>{title}</b>\n\n"
+                f"{error_text}"
+                f"🆔 {self.get_text('id_attuale')}: <code>{channel_link}</code>\n"
+                f"📊 {self.get_text('stato')}: {status_text}\n\n"
+                f"💡 {self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione')}:"
             )
-        except Exception as e:
-            logger.error(f"Error editing channel config message: {e}")
-            # Fallback: invia nuovo messaggio se edit fallisce
-            self.bot.send_message(
-                call.message.chat.id, 
-                config_text, 
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-
-    def start_channel_configuration(self, chat_id: int, user_id: int):
-        """Inizia il processo di configurazione canale"""
-        config = self.db.get_channel_config()
         
-        if config:
-            channel_link, channel_id, is_active, created_by = config
-            status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
-            
-            config_text = f"📢 <b>" + self.get_text('configurazione_canale_approvazione') + "</b>\n\n"
-            config_text += f"🆔 " + self.get_text('id_attuale') + ": <code>" + channel_link + "</code>\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"📢 <b>" + self.get_text('configurazione_canale_approvazione') + "</b>\n\n"
-            config_text += f"❌ " + self.get_text('nessun_canale_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione') + "\n\n"
-            config_text += f"⚠️ <b>" + self.get_text('importante') + ":</b> " + self.get_text('il_bot_deve_essere_già_amministratore_nel_canale') + "!\n\n"
-            config_text += f"💡 " + self.get_text('formato_esempio') + ": <code>-1001234567890</code> (" + self.get_text('id_numerico_del_canale_privato') + ")\n"
-            config_text += f"📍 " + self.get_text('come_trovare_l_id') + ": " + self.get_text('aggiungi_userinfobot_al_canale_e_scrivi_id')
+        return (
+            f"📢 <b>{title}</b>\n\n"
+            f"{error_text}"
+            f"❌ {self.get_text('nessun_canale_configurato')}\n\n"
+            f"📝 {self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione')}\n\n"
+            f"⚠️ <b>{self.get_text('importante')}:</b> {self.get_text('il_bot_deve_essere_già_amministratore_nel_canale')}!\n\n"
+            f"💡 {self.get_text('formato_esempio')}: <code>-1001234567890</code> ({self.get_text('id_numerico_del_canale_privato')})\n"
+            f"📍 {self.get_text('come_trovare_l_id')}: {self.get_text('aggiungi_userinfobot_al_canale_e_scrivi_id')}"
+        )
+    
+    def start_channel_configuration_edit(self, call):
+        """Inizia il processo di configurazione canale (edit message)"""
+        config_text, keyboard = self._begin_channel_configuration(call.message.chat.id, call.from_user.id)
         
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
+
+    def _begin_channel_configuration(self, chat_id: int, user_id: int):
+        """Imposta lo stato di configurazione canale e restituisce (testo, keyboard) della schermata"""
         self.user_states[user_id] = {
             'action': 'configuring_channel',
             'chat_id': chat_id
         }
-        
-        # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_channel_config")
-        keyboard.add(cancel_btn)
+        return self._channel_config_text(self.db.get_channel_config()), self._cancel_keyboard('cancel_channel_config')
+    
+    def start_channel_configuration(self, chat_id: int, user_id: int):
+        """Inizia il processo di configurazione canale"""
+        config_text, keyboard = self._begin_channel_configuration(chat_id, user_id)
         
         self.bot.send_message(
             chat_id, 
@@ -3040,28 +2940,10 @@ class AmazonBot:
         """Mostra il messaggio di configurazione canale con errore integrato"""
         config = self.db.get_channel_config()
         
-        if config:
-            channel_link, channel_id, is_active, created_by = config
-            status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
-            
-            config_text = f"📢 <b>" + self.get_text('configurazione_canale_approvazione') + "</b>\n\n"
-            config_text += f"❌ <b>" + self.get_text('errore') + ":</b> " + error_message + "\n\n"
-            config_text += f"🆔 " + self.get_text('id_attuale') + ": <code>" + channel_link + "</code>\n"
-            config_text += f"📊 " + self.get_text('stato') + ": " + status_text + "\n\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"📢 <b>" + self.get_text('configurazione_canale_approvazione') + "</b>\n\n"
-            config_text += f"❌ <b>" + self.get_text('errore') + ":</b> " + error_message + "\n\n"
-            config_text += f"❌ " + self.get_text('nessun_canale_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_nuovo_id_del_canale_per_aggiornare_la_configurazione') + "\n\n"
-            config_text += f"⚠️ <b>" + self.get_text('importante') + ":</b> " + self.get_text('il_bot_deve_essere_già_amministratore_nel_canale') + "!\n\n"
-            config_text += f"💡 " + self.get_text('formato_esempio') + ": <code>-1001234567890</code> (" + self.get_text('id_numerico_del_canale_privato') + ")\n"
-            config_text += f"📍 " + self.get_text('come_trovare_l_id') + ": " + self.get_text('aggiungi_userinfobot_al_canale_e_scrivi_id')
+        config_text = self._channel_config_text(config, error_message)
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_channel_config")
-        keyboard.add(cancel_btn)
+        keyboard = self._cancel_keyboard('cancel_channel_config')
         
         self.bot.send_message(
             chat_id, 
@@ -3095,9 +2977,9 @@ class AmazonBot:
         if success:
             self.bot.reply_to(
                 message,
-                f"✅ *" + self.get_text('canale_configurato_con_successo') + "!*\n\n"
-                f"🆔 " + self.get_text('id_canale') + ": `{channel_id}`\n\n"
-                f"💡 " + self.get_text('il_bot_invierà_ora_i_messaggi_di_approvazione_in_questo_canale_quando_rileva_nuovi_sconti') + ".",
+                f"✅ *{self.get_text('canale_configurato_con_successo')}!*\n\n"
+                f"🆔 {self.get_text('id_canale')}: `{channel_id}`\n\n"
+                f"💡 {self.get_text('il_bot_invierà_ora_i_messaggi_di_approvazione_in_questo_canale_quando_rileva_nuovi_sconti')}.",
                 parse_mode='Markdown'
             )
             
@@ -3111,26 +2993,48 @@ class AmazonBot:
             )
         
         # Rimuovi stato utente
-        del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
     
     # Metodi per gestire il prompt personalizzato OpenAI
-    def start_prompt_configuration(self, chat_id: int, user_id: int):
-        """Inizia il processo di configurazione prompt OpenAI"""
-        config = self.db.get_openai_prompt_config()
+    def _prompt_config_text(self, config, error_message: str = None) -> str:
+        """Costruisce il testo della schermata di configurazione prompt OpenAI (con errore opzionale)"""
+        title = self.get_text('configurazione_prompt_openai')
+        error_text = f"❌ <b>{self.get_text('errore')}:</b> {error_message}\n\n" if error_message else ""
         
         if config:
             prompt_text, is_active, created_by, created_at, updated_at = config
             status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
             
-            config_text = f"🤖 <b>" + self.get_text('configurazione_prompt_openai') + "</b>\n\n"
-            config_text += f"📝 " + self.get_text('prompt_attuale') + ":\n<code>" + prompt_text[:200] + ("..." if len(prompt_text) > 200 else "") + "</code>\n\n"
-            config_text += f"📊 " + self.get_text('stato') + ": " + status_text + "\n\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_prompt_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"🤖 <b>" + self.get_text('configurazione_prompt_openai') + "</b>\n\n"
-            config_text += f"❌ " + self.get_text('nessun_prompt_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_prompt_personalizzato_che_openai_userà_per_migliorare_i_messaggi_degli_sconti') + ".\n\n"
-            config_text += f"💡 " + self.get_text('esempio') + ": 'Riscrivi questo messaggio di sconto in modo più accattivante e persuasivo, mantenendo tutte le informazioni tecniche.'"
+            return (
+                f"🤖 <b>{title}</b>\n\n"
+                f"{error_text}"
+                f"📝 {self.get_text('prompt_attuale')}:\n<code>{self.escape_html(_truncate(prompt_text, 200))}</code>\n\n"
+                f"📊 {self.get_text('stato')}: {status_text}\n\n"
+                f"💡 {self.get_text('invia_il_nuovo_prompt_per_aggiornare_la_configurazione')}:"
+            )
+        
+        if error_message:
+            return (
+                f"🤖 <b>{title}</b>\n\n"
+                f"{error_text}"
+                f"❌ {self.get_text('nessun_prompt_configurato')}\n\n"
+                f"📝 {self.get_text('il_prompt_personalizzato_verrà_usato_da_openai_per_migliorare_i_messaggi_degli_sconti')}.\n\n"
+                f"💡 {self.get_text('usa_il_pulsante_qui_sotto_per_configurare')}.\n"
+                f"💡 {self.get_text('esempio')}: '{self.get_text('esempio_prompt')}'."
+            )
+        
+        return (
+            f"🤖 <b>{title}</b>\n\n"
+            f"❌ {self.get_text('nessun_prompt_configurato')}\n\n"
+            f"📝 {self.get_text('invia_il_prompt_personalizzato_che_openai_userà_per_migliorare_i_messaggi_degli_sconti')}.\n\n"
+            f"💡 {self.get_text('esempio')}: '{self.get_text('esempio_prompt')}'."
+        )
+    
+    def start_prompt_configuration(self, chat_id: int, user_id: int):
+        """Inizia il processo di configurazione prompt OpenAI"""
+        config = self.db.get_openai_prompt_config()
+        
+        config_text = self._prompt_config_text(config)
         
         self.user_states[user_id] = {
             'action': 'configuring_prompt',
@@ -3138,9 +3042,7 @@ class AmazonBot:
         }
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_prompt_config")
-        keyboard.add(cancel_btn)
+        keyboard = self._cancel_keyboard('cancel_prompt_config')
         
         self.bot.send_message(
             chat_id, 
@@ -3153,27 +3055,10 @@ class AmazonBot:
         """Mostra il messaggio di configurazione prompt con errore integrato"""
         config = self.db.get_openai_prompt_config()
         
-        if config:
-            prompt_text, is_active, created_by, created_at, updated_at = config
-            status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
-            
-            config_text = f"🤖 <b>" + self.get_text('configurazione_prompt_openai') + "</b>\n\n"
-            config_text += f"❌ <b>" + self.get_text('errore') + ":</b> " + error_message + "\n\n"
-            config_text += f"📝 " + self.get_text('prompt_attuale') + ":\n<code>" + prompt_text[:200] + ("..." if len(prompt_text) > 200 else "") + "</code>\n\n"
-            config_text += f"📊 " + self.get_text('stato') + ": " + status_text + "\n\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_prompt_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"🤖 <b>" + self.get_text('configurazione_prompt_openai') + "</b>\n\n"
-            config_text += f"❌ <b>" + self.get_text('errore') + ":</b> " + error_message + "\n\n"
-            config_text += f"❌ " + self.get_text('nessun_prompt_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('il_prompt_personalizzato_verrà_usato_da_openai_per_migliorare_i_messaggi_degli_sconti') + ".\n\n"
-            config_text += f"💡 " + self.get_text('usa_il_pulsante_qui_sotto_per_configurare') + "."
-            config_text += f"💡 " + self.get_text('esempio') + ": '" + self.get_text('esempio_prompt') + "'."
+        config_text = self._prompt_config_text(config, error_message)
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_prompt_config")
-        keyboard.add(cancel_btn)
+        keyboard = self._cancel_keyboard('cancel_prompt_config')
         
         self.bot.send_message(
             chat_id, 
@@ -3204,7 +3089,7 @@ class AmazonBot:
             self.bot.reply_to(
                 message,
                 f"✅ *" + self.get_text('prompt_configurato_con_successo') + "!*\n\n"
-                f"📝 " + self.get_text('prompt_salvato') + ": `" + prompt_text[:200] + "'...' if len(prompt_text) > 200 else ''`\n\n"
+                f"📝 {self.get_text('prompt_salvato')}: `{_truncate(prompt_text, 200)}`\n\n"
                 f"💡 " + self.get_text('openai_userà_ora_questo_prompt_per_migliorare_i_messaggi_degli_sconti') + ".",
                 parse_mode='Markdown'
             )
@@ -3219,37 +3104,44 @@ class AmazonBot:
             )
         
         # Rimuovi stato utente
-        del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
     
     # Metodi per gestire lo slug Amazon affiliazione
-    def start_amazon_affiliate_configuration(self, chat_id: int, user_id: int):
-        """Inizia il processo di configurazione slug Amazon"""
-        config = self.db.get_amazon_affiliate_config()
+    def _amazon_affiliate_config_text(self, config) -> str:
+        """Costruisce il testo della schermata di configurazione tag affiliazione Amazon"""
+        title = self.get_text('configurazione_tag_affiliazione_amazon')
         
         if config:
             affiliate_tag, is_active, created_by, created_at, updated_at = config
             status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
             
-            config_text = f"🔗 <b>" + self.get_text('configurazione_tag_affiliazione_amazon') + "</b>\n\n"
-            config_text += f"🏷 " + self.get_text('tag_attuale') + ": <code>" + self.escape_html(affiliate_tag) + "</code>\n\n"
-            config_text += f"📊 " + self.get_text('stato') + ": " + status_text + "\n\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_tag_di_affiliazione_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"🔗 <b>" + self.get_text('configurazione_tag_affiliazione_amazon') + "</b>\n\n"
-            config_text += f"❌ " + self.get_text('nessun_tag_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_tag_di_affiliazione_amazon_che_verrà_aggiunto_ai_link_dei_prodotti') + ".\n\n"
-            config_text += f"💡 " + self.get_text('esempio') + ": <code>" + self.get_text('miotag-21') + "</code> (" + self.get_text('il_tuo_tag_affiliazione_amazon') + ")\n"
-            config_text += f"🔗 " + self.get_text('i_link_diventeranno') + ": amazon.it/" + self.get_text('prodotto_minuscolo') + "?tag=" + self.get_text('miotag-21')
+            return (
+                f"🔗 <b>{title}</b>\n\n"
+                f"🏷 {self.get_text('tag_attuale')}: <code>{self.escape_html(affiliate_tag)}</code>\n\n"
+                f"📊 {self.get_text('stato')}: {status_text}\n\n"
+                f"💡 {self.get_text('invia_il_nuovo_tag_di_affiliazione_per_aggiornare_la_configurazione')}:"
+            )
         
+        example_tag = self.get_text('miotag-21')
+        return (
+            f"🔗 <b>{title}</b>\n\n"
+            f"❌ {self.get_text('nessun_tag_configurato')}\n\n"
+            f"📝 {self.get_text('invia_il_tag_di_affiliazione_amazon_che_verrà_aggiunto_ai_link_dei_prodotti')}.\n\n"
+            f"💡 {self.get_text('esempio')}: <code>{example_tag}</code> ({self.get_text('il_tuo_tag_affiliazione_amazon')})\n"
+            f"🔗 {self.get_text('i_link_diventeranno')}: amazon.it/{self.get_text('prodotto_minuscolo')}?tag={example_tag}"
+        )
+    
+    def _begin_amazon_affiliate_configuration(self, chat_id: int, user_id: int):
+        """Imposta lo stato di configurazione slug Amazon e restituisce (testo, keyboard) della schermata"""
         self.user_states[user_id] = {
             'action': 'configuring_amazon_affiliate',
             'chat_id': chat_id
         }
-        
-        # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_amazon_config")
-        keyboard.add(cancel_btn)
+        return self._amazon_affiliate_config_text(self.db.get_amazon_affiliate_config()), self._cancel_keyboard('cancel_amazon_config')
+    
+    def start_amazon_affiliate_configuration(self, chat_id: int, user_id: int):
+        """Inizia il processo di configurazione slug Amazon"""
+        config_text, keyboard = self._begin_amazon_affiliate_configuration(chat_id, user_id)
         
         self.bot.send_message(
             chat_id, 
@@ -3260,46 +3152,9 @@ class AmazonBot:
     
     def start_amazon_affiliate_configuration_edit(self, call):
         """Inizia il processo di configurazione slug Amazon (edit message)"""
-        user_id = call.from_user.id
-        chat_id = call.message.chat.id
-        
-        config = self.db.get_amazon_affiliate_config()
-        
-        if config:
-            affiliate_tag, is_active, created_by, created_at, updated_at = config
-            status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
-            
-            config_text = f"🔗 <b>" + self.get_text('configurazione_tag_affiliazione_amazon') + "</b>\n\n"
-            config_text += f"🏷 " + self.get_text('tag_attuale') + ": <code>" + self.escape_html(affiliate_tag) + "</code>\n\n"
-            config_text += f"📊 " + self.get_text('stato') + ": " + status_text + "\n\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_tag_di_affiliazione_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"🔗 <b>" + self.get_text('configurazione_tag_affiliazione_amazon') + "</b>\n\n"
-            config_text += f"❌ " + self.get_text('nessun_tag_configurato') + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_tag_di_affiliazione_amazon_che_verrà_aggiunto_ai_link_dei_prodotti') + ".\n\n"
-            config_text += f"💡 " + self.get_text('esempio') + ": <code>" + self.get_text('miotag-21') + "</code> (" + self.get_text('il_tuo_tag_affiliazione_amazon') + ")\n"
-            config_text += f"🔗 " + self.get_text('i_link_diventeranno') + ": amazon.it/" + self.get_text('prodotto_minuscolo') + "?tag=" + self.get_text('miotag-21')
-        
-        self.user_states[user_id] = {
-            'action': 'configuring_amazon_affiliate',
-            'chat_id': chat_id
-        }
+        config_text, keyboard = self._begin_amazon_affiliate_configuration(call.message.chat.id, call.from_user.id)
         
-        # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_amazon_config")
-        keyboard.add(cancel_btn)
-        
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                chat_id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            logger.error(f"Error modifying Amazon configuration message: {e}")
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
     
     def handle_amazon_affiliate_configuration_input(self, message):
         """Gestisce l'input per la configurazione del tag affiliazione"""
@@ -3313,9 +3168,9 @@ class AmazonBot:
         if not affiliate_tag or len(affiliate_tag) < 3:
             self.bot.reply_to(
                 message,
-                f"❌ *" + self.get_text('tag_non_valido') + "*\n\n"
+                f"❌ *{self.get_text('tag_non_valido')}*\n\n"
                 f"{self.get_text('il_tag_di_affiliazione_deve_essere_almeno_di_3_caratteri')}.\n\n"
-                "💡 " + self.get_text('esempio') + ": `" + self.get_text('miotag-21') + "`\n\n"
+                f"💡 {self.get_text('esempio')}: `{self.get_text('miotag-21')}`\n\n"
                 f"{self.get_text('riprova_con_un_tag_valido_o_invia_annulla_per_annullare')}.",
                 parse_mode='Markdown'
             )
@@ -3335,9 +3190,9 @@ class AmazonBot:
             
             self.bot.reply_to(
                 message,
-                f"✅ *" + self.get_text('tag_affiliazione_configurato_con_successo') + "!*\n\n"
-                f"🏷 " + self.get_text('tag_salvato') + ": `" + affiliate_tag + "`\n\n"
-                f"💡 " + self.get_text('tutti_i_link_amazon_nei_messaggi_del_canale_avranno_ora_il_tuo_tag_di_affiliazione') + ".",
+                f"✅ *{self.get_text('tag_affiliazione_configurato_con_successo')}!*\n\n"
+                f"🏷 {self.get_text('tag_salvato')}: `{affiliate_tag}`\n\n"
+                f"💡 {self.get_text('tutti_i_link_amazon_nei_messaggi_del_canale_avranno_ora_il_tuo_tag_di_affiliazione')}.",
                 parse_mode='Markdown',
                 reply_markup=keyboard
             )
@@ -3352,7 +3207,7 @@ class AmazonBot:
             )
         
         # Rimuovi stato utente
-        del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
     
     def add_affiliate_tag_to_url(self, amazon_url: str) -> str:
         """Aggiunge il tag di affiliazione all'URL Amazon"""
@@ -3364,11 +3219,7 @@ class AmazonBot:
         if not is_active or not affiliate_tag:
             return amazon_url
         
-        # Se l'URL ha già parametri, aggiungi il tag con &
-        if '?' in amazon_url:
-            return f"{amazon_url}&tag={affiliate_tag}"
-        else:
-            return f"{amazon_url}?tag={affiliate_tag}"
+        return _url_with_affiliate_tag(amazon_url, affiliate_tag)
     
     # Metodi per gestire la gestione admin
     def show_admin_management_edit(self, call):
@@ -3377,107 +3228,56 @@ class AmazonBot:
         
         # Solo i God Admin possono gestire altri admin
         if not self.is_god_admin(user_id):
-            unauthorized_text = "❌ <b>" + self.get_text('accesso_negato') + "</b>\n\n"
-            unauthorized_text += "🔒 " + self.get_text('solo_i_god_admin_possono_gestire_altri_amministratori') + ".\n\n"
-            unauthorized_text += "👤 " + self.get_text('il_tuo_livello') + ": <b>" + self.get_text('regular_admin') + "</b>"
+            unauthorized_text = (
+                f"❌ <b>{self.get_text('accesso_negato')}</b>\n\n"
+                f"🔒 {self.get_text('solo_i_god_admin_possono_gestire_altri_amministratori')}.\n\n"
+                f"👤 {self.get_text('il_tuo_livello')}: <b>{self.get_text('regular_admin')}</b>"
+            )
             
             keyboard = types.InlineKeyboardMarkup()
             back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
             keyboard.add(back_btn)
             
-            try:
-                self.bot.edit_message_text(
-                    unauthorized_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                try:
-                    self.bot.edit_message_caption(
-                        call.message.chat.id,
-                        call.message.message_id,
-                        caption=unauthorized_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        unauthorized_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('accesso_negato'))
+            self._safe_edit_or_send(call, unauthorized_text, parse_mode='HTML', reply_markup=keyboard)
             return
         
         # Ottieni lista admin
         admin_users = self.db.get_all_admin_users()
         god_admin_count = len(self.authorized_users)
         
-        admin_text = "👥 <b>" + self.get_text('gestione_amministratori') + "</b>\n\n"
-        admin_text += "🔐 <b>" + self.get_text('importante') + ":</b> " + self.get_text('solo_i_god_admin_possono_gestire_altri_amministratori') + ".\n\n"
-        admin_text += f"⚡️ <b>" + self.get_text('god_admin') + ":</b> " + str(god_admin_count) + " " + self.get_text('utenti_definiti_nel_file_env') + "\n"
-        admin_text += f"👤 <b>" + self.get_text('regular_admin') + ":</b> " + str(len(admin_users)) + " " + self.get_text('utenti_aggiunti_dinamicamente') + "\n\n"
-        
         if admin_users:
-            admin_text += "<b>📋 " + self.get_text('lista_regular_admin') + ":</b>\n"
+            list_text = f"<b>📋 {self.get_text('lista_regular_admin')}:</b>\n"
         else:
-            admin_text += "📋 <b>" + self.get_text('nessun_regular_admin_presente') + "</b>\n\n"
-            admin_text += self.get_text('usa_il_pulsante_qui_sotto_per_aggiungere_il_primo_amministratore') + "."
-        
-        # Keyboard con admin e azioni
-        keyboard = types.InlineKeyboardMarkup(row_width=1)
-        
-        # Lista admin con pulsanti rimuovi
-        for admin_user_id, username, first_name, last_name, is_active, added_by, created_at in admin_users:
-            # Usa solo l'ID per il display
-            display_id = str(admin_user_id)
-            
-            # Bottone info admin con possibilità di rimuovere
-            remove_btn = types.InlineKeyboardButton(
-                f"🗑 Rimuovi: {display_id}",
-                callback_data=f"remove_admin_{admin_user_id}"
+            list_text = (
+                f"📋 <b>{self.get_text('nessun_regular_admin_presente')}</b>\n\n"
+                f"{self.get_text('usa_il_pulsante_qui_sotto_per_aggiungere_il_primo_amministratore')}."
             )
-            keyboard.add(remove_btn)
         
-        # Bottone aggiungi admin
-        add_btn = types.InlineKeyboardButton(
-            f"➕ " + self.get_text('aggiungi_nuovo_admin'), 
-            callback_data="add_admin_user"
+        admin_text = (
+            f"👥 <b>{self.get_text('gestione_amministratori')}</b>\n\n"
+            f"🔐 <b>{self.get_text('importante')}:</b> {self.get_text('solo_i_god_admin_possono_gestire_altri_amministratori')}.\n\n"
+            f"⚡️ <b>{self.get_text('god_admin')}:</b> {god_admin_count} {self.get_text('utenti_definiti_nel_file_env')}\n"
+            f"👤 <b>{self.get_text('regular_admin')}:</b> {len(admin_users)} {self.get_text('utenti_aggiunti_dinamicamente')}\n\n"
+            f"{list_text}"
         )
-        keyboard.add(add_btn)
         
-        # Bottone back al menu principale
-        back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-        keyboard.add(back_btn)
+        # Lista admin con pulsanti rimuovi (solo l'ID per il display)
+        buttons = [
+            types.InlineKeyboardButton(f"🗑 Rimuovi: {admin_user_id}", callback_data=f"remove_admin_{admin_user_id}")
+            for admin_user_id, *_ in admin_users
+        ]
+        
+        # Bottone aggiungi admin e back al menu principale
+        buttons.append(types.InlineKeyboardButton("➕ " + self.get_text('aggiungi_nuovo_admin'), callback_data="add_admin_user"))
+        buttons.append(types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu"))
+        
+        # Keyboard con admin e azioni, una riga per bottone
+        keyboard = types.InlineKeyboardMarkup(row_width=1)
+        keyboard.add(*buttons)
         
-        try:
-            self.bot.edit_message_text(
-                admin_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=admin_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    admin_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
         self.bot.answer_callback_query(call.id, "👥 " + self.get_text('gestione_admin'))
+        self._safe_edit_or_send(call, admin_text, parse_mode='HTML', reply_markup=keyboard)
     
     def start_add_admin_process_edit(self, call, user_id: int):
         """Inizia il processo di aggiunta admin (edit message)"""
@@ -3491,45 +3291,21 @@ class AmazonBot:
             'chat_id': call.message.chat.id
         }
         
-        add_admin_text = "➕ <b>" + self.get_text('aggiungi_nuovo_amministratore') + "</b>\n\n"
-        add_admin_text += "👤 " + self.get_text('invia_l_id_numerico_dell_utente_da_rendere_amministratore') + ".\n\n"
-        add_admin_text += "💡 <b>" + self.get_text('come_trovare_l_id') + ":</b>\n"
-        add_admin_text += "• " + self.get_text('l_utente_può_scrivere_a_userinfobot_e_inviare_start') + "\n"
-        add_admin_text += "• " + self.get_text('oppure_usare_rawdatabot_per_ottenere_l_id') + "\n\n"
-        add_admin_text += "📝 <b>" + self.get_text('esempio_id') + ":</b> <code>123456789</code>\n\n"
-        add_admin_text += "⚠️ <b>" + self.get_text('nota') + ":</b> " + self.get_text('i_regular_admin_potranno_usare_il_bot_ma_non_potranno_aggiungere_altri_amministratori') + "."
+        add_admin_text = (
+            f"➕ <b>{self.get_text('aggiungi_nuovo_amministratore')}</b>\n\n"
+            f"👤 {self.get_text('invia_l_id_numerico_dell_utente_da_rendere_amministratore')}.\n\n"
+            f"💡 <b>{self.get_text('come_trovare_l_id')}:</b>\n"
+            f"• {self.get_text('l_utente_può_scrivere_a_userinfobot_e_inviare_start')}\n"
+            f"• {self.get_text('oppure_usare_rawdatabot_per_ottenere_l_id')}\n\n"
+            f"📝 <b>{self.get_text('esempio_id')}:</b> <code>123456789</code>\n\n"
+            f"⚠️ <b>{self.get_text('nota')}:</b> {self.get_text('i_regular_admin_potranno_usare_il_bot_ma_non_potranno_aggiungere_altri_amministratori')}."
+        )
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_admin_config")
-        keyboard.add(cancel_btn)
-        
-        try:
-            self.bot.edit_message_text(
-                add_admin_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=add_admin_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    add_admin_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+        keyboard = self._cancel_keyboard('cancel_admin_config')
         
         self.bot.answer_callback_query(call.id, "➕ " + self.get_text('aggiungi_admin'))
+        self._safe_edit_or_send(call, add_admin_text, parse_mode='HTML', reply_markup=keyboard)
     
     def handle_add_admin_input(self, message):
         """Gestisce l'input per aggiungere un nuovo admin"""
@@ -3545,21 +3321,25 @@ class AmazonBot:
         except ValueError:
             self.bot.reply_to(
                 message,
-                f"❌ <b>" + self.get_text('id_non_valido') + "</b>\n\n" +
-                 self.get_text('l_id_deve_essere_un_numero_intero') + ".\n\n" +
-                f"💡 " + self.get_text('esempio') + ": <code>123456789</code>\n\n" +
+                f"❌ <b>{self.get_text('id_non_valido')}</b>\n\n"
+                f"{self.get_text('l_id_deve_essere_un_numero_intero')}.\n\n"
+                f"💡 {self.get_text('esempio')}: <code>123456789</code>\n\n"
                 f"{self.get_text('riprova_con_un_id_valido')}:",
-                parse_mode='HTML'
+                parse_mode='HTML',
+                disable_notification=True
             )
             return
         
         # Controlla che non sia già autorizzato
         if self.is_user_authorized(new_admin_id):
-            error_text = "⚠️ <b>" + self.get_text('utente_già_autorizzato') + "</b>\n\n"
             if self.is_god_admin(new_admin_id):
-                error_text += f"👤 " + self.get_text('l_utente') + " <code>" + str(new_admin_id) + "</code> " + self.get_text('è_già_un') + " <b>" + self.get_text('god_admin') + "</b> " + self.get_text('definito_nel_file_env') + "."
+                level_text = f"<b>{self.get_text('god_admin')}</b> {self.get_text('definito_nel_file_env')}"
             else:
-                error_text += f"👤 {self.get_text('l_utente')} <code>" + str(new_admin_id) + "</code> {self.get_text('è_già_un')} <b>{self.get_text('regular_admin')}</b>."
+                level_text = f"<b>{self.get_text('regular_admin')}</b>"
+            error_text = (
+                f"⚠️ <b>{self.get_text('utente_già_autorizzato')}</b>\n\n"
+                f"👤 {self.get_text('l_utente')} <code>{new_admin_id}</code> {self.get_text('è_già_un')} {level_text}."
+            )
             
             # Keyboard con bottone per tornare alla gestione admin
             keyboard = types.InlineKeyboardMarkup()
@@ -3570,11 +3350,12 @@ class AmazonBot:
                 message,
                 error_text,
                 parse_mode='HTML',
+                disable_notification=True,
                 reply_markup=keyboard
             )
             
             # Rimuovi stato utente
-            del self.user_states[user_id]
+            self.user_states.pop(user_id, None)
             return
         
         # Prova ad aggiungere l'admin (usando solo l'ID)
@@ -3584,11 +3365,13 @@ class AmazonBot:
         )
         
         if success:
-            success_text = f"✅ <b>{self.get_text('amministratore_aggiunto_con_successo')}!</b>\n\n"
-            success_text += f"👤 <b>" + self.get_text('nuovo_admin_id') + ":</b> <code>" + str(new_admin_id) + "</code>\n"
-            success_text += f"🔑 <b>" + self.get_text('livello') + ":</b> " + self.get_text('regular_admin') + "\n"
-            success_text += f"⚡️ <b>" + self.get_text('aggiunto_da') + ":</b> <code>" + str(user_id) + "</code>\n\n"
-            success_text += f"💡 " + self.get_text('l_utente') + " <code>" + str(new_admin_id) + "</code> " + self.get_text('può_ora_utilizzare_il_bot_ma_non_può_aggiungere_altri_amministratori') + "."
+            success_text = (
+                f"✅ <b>{self.get_text('amministratore_aggiunto_con_successo')}!</b>\n\n"
+                f"👤 <b>{self.get_text('nuovo_admin_id')}:</b> <code>{new_admin_id}</code>\n"
+                f"🔑 <b>{self.get_text('livello')}:</b> {self.get_text('regular_admin')}\n"
+                f"⚡️ <b>{self.get_text('aggiunto_da')}:</b> <code>{user_id}</code>\n\n"
+                f"💡 {self.get_text('l_utente')} <code>{new_admin_id}</code> {self.get_text('può_ora_utilizzare_il_bot_ma_non_può_aggiungere_altri_amministratori')}."
+            )
             
             # Keyboard con bottone per tornare alla gestione admin
             keyboard = types.InlineKeyboardMarkup()
@@ -3599,6 +3382,7 @@ class AmazonBot:
                 message,
                 success_text,
                 parse_mode='HTML',
+                disable_notification=True,
                 reply_markup=keyboard
             )
             
@@ -3608,11 +3392,12 @@ class AmazonBot:
             self.bot.reply_to(
                 message,
                 "❌ <b>" + self.get_text('errore_nell_aggiunta') + "</b>\n\n" + self.get_text('si_è_verificato_un_errore_riprova') + ".",
-                parse_mode='HTML'
+                parse_mode='HTML',
+                disable_notification=True
             )
         
         # Rimuovi stato utente
-        del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
     
     def confirm_remove_admin(self, call, admin_user_id: int):
         """Mostra conferma rimozione admin"""
@@ -3628,12 +3413,14 @@ class AmazonBot:
         if username:
             display_name += f" (@{username})"
         
-        confirm_text = f"🗑 <b>" + self.get_text('conferma_rimozione_amministratore') + "</b>\n\n"
-        confirm_text += f"🆔 <b>" + self.get_text('id') + ":</b> <code>" + str(admin_user_id) + "</code>\n"
-        confirm_text += f"📅 <b>" + self.get_text('aggiunto_il') + ":</b> " + created_at[:16] + "\n"
-        confirm_text += f"👥 <b>" + self.get_text('aggiunto_da') + ":</b> <code>" + str(added_by) + "</code>\n\n"
-        confirm_text += "⚠️ <b>" + self.get_text('questa_azione_non_può_essere_annullata') + "</b>\n"
-        confirm_text += self.get_text('l_utente_non_potrà_più_utilizzare_il_bot') + "."
+        confirm_text = (
+            f"🗑 <b>{self.get_text('conferma_rimozione_amministratore')}</b>\n\n"
+            f"🆔 <b>{self.get_text('id')}:</b> <code>{admin_user_id}</code>\n"
+            f"📅 <b>{self.get_text('aggiunto_il')}:</b> {created_at[:16]}\n"
+            f"👥 <b>{self.get_text('aggiunto_da')}:</b> <code>{added_by}</code>\n\n"
+            f"⚠️ <b>{self.get_text('questa_azione_non_può_essere_annullata')}</b>\n"
+            f"{self.get_text('l_utente_non_potrà_più_utilizzare_il_bot')}."
+        )
         
         keyboard = types.InlineKeyboardMarkup()
         confirm_btn = types.InlineKeyboardButton(
@@ -3647,48 +3434,29 @@ class AmazonBot:
         keyboard.add(confirm_btn)
         keyboard.add(cancel_btn)
         
-        try:
-            self.bot.edit_message_text(
-                confirm_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=confirm_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    confirm_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+        # Ricorda l'admin appena verificato: la conferma entro 60s non lo rilegge dal database
+        self._pending_admin_removals[call.from_user.id] = (admin_user_id, time.monotonic())
+        
         self.bot.answer_callback_query(call.id, "⚠️ " + self.get_text('conferma_rimozione'))
+        self._safe_edit_or_send(call, confirm_text, parse_mode='HTML', reply_markup=keyboard)
     
     def remove_admin_final(self, call, admin_user_id: int):
         """Rimuove definitivamente l'admin"""
-        admin_info = self.db.get_admin_user_info(admin_user_id)
-        if not admin_info:
+        pending = self._pending_admin_removals.pop(call.from_user.id, None)
+        confirmed = pending and pending[0] == admin_user_id and time.monotonic() - pending[1] < 60
+        if not confirmed and not self.db.get_admin_user_info(admin_user_id):
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('admin_non_trovato'))
             return
         
-        user_id, username, first_name, last_name, is_active, added_by, created_at = admin_info
-        
         # Rimuovi l'admin dal database
         success = self.db.remove_admin_user(admin_user_id)
         
         if success:
-            success_text = f"✅ <b>" + self.get_text('amministratore_rimosso') + "</b>\n\n"
-            success_text += f"👤 " + self.get_text('l_utente') + " <code>" + str(admin_user_id) + "</code> " + self.get_text('è_stato_rimosso_dagli_amministratori') + ".\n\n"
-            success_text += f"🚫 " + self.get_text('l_utente') + " <code>" + str(admin_user_id) + "</code> " + self.get_text('non_può_più_utilizzare_il_bot') + "."
+            success_text = (
+                f"✅ <b>{self.get_text('amministratore_rimosso')}</b>\n\n"
+                f"👤 {self.get_text('l_utente')} <code>{admin_user_id}</code> {self.get_text('è_stato_rimosso_dagli_amministratori')}.\n\n"
+                f"🚫 {self.get_text('l_utente')} <code>{admin_user_id}</code> {self.get_text('non_può_più_utilizzare_il_bot')}."
+            )
             
             # Keyboard per tornare alla gestione admin
             keyboard = types.InlineKeyboardMarkup()
@@ -3698,42 +3466,24 @@ class AmazonBot:
             )
             keyboard.add(back_btn)
             
-            try:
-                self.bot.edit_message_text(
-                    success_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                try:
-                    self.bot.edit_message_caption(
-                        call.message.chat.id,
-                        call.message.message_id,
-                        caption=success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        success_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
+            self.bot.answer_callback_query(call.id, "✅ " + self.get_text('admin_rimosso'))
+            self._safe_edit_or_send(call, success_text, parse_mode='HTML', reply_markup=keyboard)
             
             self.db.log_interaction(call.from_user.id, 'remove_admin', f"{self.get_text('admin_rimosso')}: {admin_user_id}")
             logger.info(f"{self.get_text('admin_rimosso')} {admin_user_id} {self.get_text('rimosso_da')} {self.get_text('god_admin')} {call.from_user.id}")
-            self.bot.answer_callback_query(call.id, "✅ " + self.get_text('admin_rimosso'))
         else:
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_nella_rimozione'))
     
     # Metodi per gestire l'approvazione automatica
     def show_auto_approval_config_edit(self, call):
         """Mostra la configurazione approvazione automatica (edit message)"""
-        config = self.db.get_auto_approval_config()
+        config_text, keyboard = self._auto_approval_screen(self.db.get_auto_approval_config())
         
+        self.bot.answer_callback_query(call.id, "⚡️ " + self.get_text('approvazione_automatica'))
+        self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
+    
+    def _auto_approval_screen(self, config):
+        """Testo e keyboard della schermata di approvazione automatica"""
         if config:
             is_enabled, created_by, created_at, updated_at = config
             status_emoji = "✅" if is_enabled else "❌"
@@ -3745,100 +3495,75 @@ class AmazonBot:
             created_by = None
             created_at = None
         
-        config_text = f"⚡️ <b>" + self.get_text('configurazione_approvazione_automatica') + "</b>\n\n"
-        config_text += f"{status_emoji} <b>{self.get_text('stato_attuale')}:</b> {status_text}\n\n"
-        
         if is_enabled:
-            config_text += "🤖 <b>" + self.get_text('modalità_attiva') + ":</b> " + self.get_text('i_messaggi_degli_sconti_vengono_automaticamente_approvati_e_inviati_ai_gruppi_senza_intervento_manuale') + ".\n\n"
-            config_text += "📢 <b>" + self.get_text('canale_database') + ":</b> " + self.get_text('se_configurato_i_messaggi_verranno_comunque_inviati_al_canale_database_ma_SENZA_pulsante_di_approvazione_così_avrai_sempre_l_elenco_completo_per_eventuali_ripost_futuri') + ".\n\n"
+            mode_text = (
+                f"🤖 <b>{self.get_text('modalità_attiva')}:</b> {self.get_text('i_messaggi_degli_sconti_vengono_automaticamente_approvati_e_inviati_ai_gruppi_senza_intervento_manuale')}.\n\n"
+                f"📢 <b>{self.get_text('canale_database')}:</b> {self.get_text('se_configurato_i_messaggi_verranno_comunque_inviati_al_canale_database_ma_SENZA_pulsante_di_approvazione_così_avrai_sempre_l_elenco_completo_per_eventuali_ripost_futuri')}.\n\n"
+            )
         else:
-            config_text += "👤 <b>" + self.get_text('modalità_attiva') + ":</b> " + self.get_text('i_messaggi_degli_sconti_richiedono_approvazione_manuale_prima_di_essere_inviati_ai_gruppi') + ".\n\n"
-            config_text += "📢 <b>" + self.get_text('canale_database') + ":</b> " + self.get_text('i_messaggi_vengono_inviati_al_canale_database_CON_pulsante_di_approvazione_per_la_revisione_manuale') + ".\n\n"
+            mode_text = (
+                f"👤 <b>{self.get_text('modalità_attiva')}:</b> {self.get_text('i_messaggi_degli_sconti_richiedono_approvazione_manuale_prima_di_essere_inviati_ai_gruppi')}.\n\n"
+                f"📢 <b>{self.get_text('canale_database')}:</b> {self.get_text('i_messaggi_vengono_inviati_al_canale_database_CON_pulsante_di_approvazione_per_la_revisione_manuale')}.\n\n"
+            )
         
-        config_text += "💡 <b>" + self.get_text('scegli_la_modalità_desiderata') + ":</b>"
+        config_text = (
+            f"⚡️ <b>{self.get_text('configurazione_approvazione_automatica')}</b>\n\n"
+            f"{status_emoji} <b>{self.get_text('stato_attuale')}:</b> {status_text}\n\n"
+            f"{mode_text}"
+            f"💡 <b>{self.get_text('scegli_la_modalità_desiderata')}:</b>"
+        )
         
         if created_at:
-            config_text += f"\n\n📅 " + self.get_text('ultimo_aggiornamento') + ": " + updated_at[:16] if updated_at else created_at[:16]
+            config_text += f"\n\n📅 {self.get_text('ultimo_aggiornamento')}: {(updated_at or created_at)[:16]}"
             if created_by:
-                config_text += f"\n👤 " + self.get_text('configurato_da') + ": <code>" + str(created_by) + "</code>"
+                config_text += f"\n👤 {self.get_text('configurato_da')}: <code>{created_by}</code>"
         
-        # Keyboard con radio buttons
-        keyboard = types.InlineKeyboardMarkup(row_width=1)
-        
-        # Bottone per abilitare (con indicatore radio)
-        if is_enabled:
-            enable_btn = types.InlineKeyboardButton(
-                f"🔘 " + self.get_text('abilita_approvazione_automatica'), 
-                callback_data="toggle_auto_approval_enable"
-            )
-        else:
-            enable_btn = types.InlineKeyboardButton(
-                f"⚪️ " + self.get_text('abilita_approvazione_automatica'), 
+        return config_text, self._auto_approval_keyboard(bool(is_enabled))
+    
+    def _auto_approval_keyboard(self, is_enabled: bool):
+        """Keyboard con radio buttons: solo due varianti per lingua, costruite una volta"""
+        key = (is_enabled, self.translator.get_current_language())
+        keyboard = self._auto_approval_keyboards.get(key)
+        if keyboard is None:
+            keyboard = types.InlineKeyboardMarkup(row_width=1)
+            
+            # Bottoni abilita/disabilita: l'indicatore radio pieno segue lo stato attuale
+            enable_mark, disable_mark = ("🔘", "⚪️") if is_enabled else ("⚪️", "🔘")
+            keyboard.add(types.InlineKeyboardButton(
+                f"{enable_mark} {self.get_text('abilita_approvazione_automatica')}",
                 callback_data="toggle_auto_approval_enable"
-            )
-        
-        # Bottone per disabilitare (con indicatore radio)
-        if not is_enabled:
-            disable_btn = types.InlineKeyboardButton(
-                f"🔘 " + self.get_text('disabilita_approvazione_automatica'), 
-                callback_data="toggle_auto_approval_disable"
-            )
-        else:
-            disable_btn = types.InlineKeyboardButton(
-                f"⚪️ " + self.get_text('disabilita_approvazione_automatica'), 
+            ))
+            keyboard.add(types.InlineKeyboardButton(
+                f"{disable_mark} {self.get_text('disabilita_approvazione_automatica')}",
                 callback_data="toggle_auto_approval_disable"
-            )
-        
-        keyboard.add(enable_btn)
-        keyboard.add(disable_btn)
-        
-        # Bottone back al menu principale
-        back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-        keyboard.add(back_btn)
-        
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            try:
-                self.bot.edit_message_caption(
-                    call.message.chat.id,
-                    call.message.message_id,
-                    caption=config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e2:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    config_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-        self.bot.answer_callback_query(call.id, "⚡️ " + self.get_text('approvazione_automatica'))
+            ))
+            
+            # Bottone back al menu principale
+            keyboard.add(types.InlineKeyboardButton("🔙 " + self.get_text('menu_principale'), callback_data="back_to_main_menu"))
+            self._auto_approval_keyboards[key] = keyboard
+        return keyboard
     
     def toggle_auto_approval(self, call, enable: bool):
         """Toggle dello stato dell'approvazione automatica"""
         user_id = call.from_user.id
+        status_text = self.get_text('abilitata') if enable else self.get_text('disabilitata')
+        status_emoji = "✅" if enable else "❌"
+        confirmation_message = f"{status_emoji} {self.get_text('approvazione_automatica')} {status_text}"
+        
+        # Opzione già selezionata: niente da salvare né da ridisegnare
+        config = self.db.get_auto_approval_config()
+        if bool(config and config[0]) == enable:
+            self.bot.answer_callback_query(call.id, confirmation_message)
+            return
         
         # Salva la configurazione
         success = self.db.update_auto_approval_config(enable, user_id)
         
         if success:
-            status_text = self.get_text('abilitata') if enable else self.get_text('disabilitata')
-            status_emoji = "✅" if enable else "❌"
-            
-            # Aggiorna il menu mantenendo la stessa interfaccia
-            self.show_auto_approval_config_edit(call)
-            
-            # Messaggio di conferma
-            confirmation_message = f"{status_emoji} {self.get_text('approvazione_automatica')} {status_text}"
+            # Conferma subito, poi aggiorna il menu mantenendo la stessa interfaccia
             self.bot.answer_callback_query(call.id, confirmation_message)
+            config_text, keyboard = self._auto_approval_screen(self.db.get_auto_approval_config())
+            self._safe_edit_or_send(call, config_text, parse_mode='HTML', reply_markup=keyboard)
             
             # Log dell'azione
             self.db.log_interaction(user_id, 'toggle_auto_approval', f"{self.get_text('stato')}: {status_text}")
@@ -3847,7 +3572,7 @@ class AmazonBot:
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_nell_aggiornamento'))
     
     def improve_message_with_openai(self, original_message: str) -> str:
-        """Migliora il messaggio usando OpenAI ChatGPT-4"""
+        """Migliora il messaggio usando OpenAI ChatGPT (modello da OPENAI_MODEL)"""
         if not self.openai_api_key:
             logger.warning("OpenAI API key not configured")
             return original_message
@@ -3863,31 +3588,83 @@ class AmazonBot:
             logger.info("Prompt OpenAI disabled")
             return original_message
         
+        # Stesso prompt e stesso messaggio (es. offerta rilevata di nuovo): riusa il risultato già ottenuto
+        cache_key = (custom_prompt, original_message)
+        with self._openai_cache_lock:
+            cached = self._openai_cache.get(cache_key)
+            if cached is not None:
+                self._openai_cache.move_to_end(cache_key)
+                logger.info("Message improved with OpenAI (cached)")
+                return cached
+        
         try:
-            # Import locale per evitare conflitti
-            import openai
-            
-            # Chiamata all'API OpenAI con la sintassi più semplice
-            openai.api_key = self.openai_api_key
-            
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": custom_prompt},
-                    {"role": "user", "content": original_message}
-                ],
-                max_tokens=500,
-                temperature=0.7
+            # Chiamata diretta all'endpoint chat completions sulla sessione persistente
+            response = self._openai_session.post(
+                _OPENAI_CHAT_COMPLETIONS_URL,
+                json={
+                    "model": self.openai_model,
+                    "messages": [
+                        {"role": "system", "content": custom_prompt},
+                        {"role": "user", "content": original_message}
+                    ],
+                    "max_tokens": 500,
+                    "temperature": 0.7
+                },
+                timeout=(5, 60)
             )
+            response.raise_for_status()
             
-            improved_message = response.choices[0].message.content.strip()
+            improved_message = response.json()['choices'][0]['message']['content'].strip()
             logger.info("Message improved with OpenAI")
+            
+            with self._openai_cache_lock:
+                self._openai_cache[cache_key] = improved_message
+                if len(self._openai_cache) > _OPENAI_CACHE_SIZE:
+                    self._openai_cache.popitem(last=False)
             return improved_message
             
         except Exception as e:
             logger.error(f"Error calling OpenAI: {e}")
             return original_message
     
+    def _discount_original_message(self, product_data: Dict[str, Any]) -> str:
+        """Messaggio di sconto da passare a OpenAI (testo semplice, senza link)"""
+        return (
+            f"🔥 {self.get_text('nuovo_sconto_rilevato')} 🔥\n\n"
+            f"📦 {product_data.get('title', self.get_text('prodotto_amazon'))}\n\n"
+            f"📂 {self.get_text('categoria')}: {product_data.get('category_name', self.get_text('senza_categoria'))}\n"
+            f"💰 {self.get_text('sconto')}: -{product_data.get('discount_percentage', 0)}%\n"
+            f"💲 {self.get_text('prezzo_originale')}: {product_data.get('original_price', self.get_text('n_a'))}\n"
+            f"💲 {self.get_text('prezzo_scontato')}: {product_data.get('discounted_price', self.get_text('n_a'))}"
+        )
+    
+    def _remember_bad_image_url(self, image_url: str, error: Exception):
+        """Segna l'immagine come non inviabile solo se Telegram non è riuscito a scaricarla o elaborarla"""
+        if not isinstance(error, telebot.apihelper.ApiTelegramException) or error.error_code != 400:
+            return
+        description = (error.description or '').lower()
+        if not any(marker in description for marker in _BAD_IMAGE_ERRORS):
+            return  # Es. caption troppo lunga o entità HTML non valide: l'immagine resta utilizzabile
+        with self._bad_image_urls_lock:
+            self._bad_image_urls[image_url] = None
+            self._bad_image_urls.move_to_end(image_url)
+            if len(self._bad_image_urls) > _BAD_IMAGE_URLS_SIZE:
+                self._bad_image_urls.popitem(last=False)
+    
+    def _discount_notification_html(self, title: str, category_name: str, discount_percentage,
+                                    original_price: str, discounted_price: str, amazon_url: str) -> str:
+        """Messaggio di sconto in HTML quando OpenAI non lo migliora (campi testuali con escape)"""
+        escape = self.escape_html
+        return (
+            f"🔥 <b>{self.get_text('nuovo_sconto_rilevato')}</b> 🔥\n\n"
+            f"📦 <b>{escape(title)}</b>\n\n"
+            f"📂 {self.get_text('categoria')}: <b>{escape(category_name)}</b>\n"
+            f"💰 {self.get_text('sconto')}: <b>-{discount_percentage}%</b>\n"
+            f"💲 {self.get_text('prezzo_originale')}: <s>{escape(original_price)}</s>\n"
+            f"💲 {self.get_text('prezzo_scontato')}: <b>{escape(discounted_price)}</b>\n\n"
+            f"🔗 <a href='{amazon_url}'>{self.get_text('vai_al_prodotto')}</a>"
+        )
+    
     def send_discount_notification(self, product_id: int, discount_id: int, product_data: Dict[str, Any]):
         """Invia notifica di sconto al canale di approvazione"""
         config = self.db.get_channel_config()
@@ -3911,22 +3688,15 @@ class AmazonBot:
             original_price = product_data.get('original_price', self.get_text('n_a'))
             discounted_price = product_data.get('discounted_price', self.get_text('n_a'))
             
-            # Escape caratteri speciali per Markdown
-            escaped_title = self.escape_markdown(title)
-            escaped_category = self.escape_markdown(category_name)
-            escaped_original = self.escape_markdown(original_price)
-            escaped_discounted = self.escape_markdown(discounted_price)
-            
             # Crea il messaggio originale (senza escape per OpenAI) - SENZA LINK
-            original_message = f"🔥 {self.get_text('nuovo_sconto_rilevato')} 🔥\n\n"
-            original_message += f"📦 {title}\n\n"
-            original_message += f"📂 {self.get_text('categoria')}: {category_name}\n"
-            original_message += f"💰 {self.get_text('sconto')}: -{discount_percentage}%\n"
-            original_message += f"💲 {self.get_text('prezzo_originale')}: {original_price}\n"
-            original_message += f"💲 {self.get_text('prezzo_scontato')}: {discounted_price}"
+            original_message = self._discount_original_message(product_data)
             
-            # Migliora il messaggio con OpenAI
-            improved_message = self.improve_message_with_openai(original_message)
+            # Migliora il messaggio con OpenAI (già avviato al rilevamento dello sconto, se possibile)
+            improved_future = product_data.get('improved_future')
+            if improved_future is not None:
+                improved_message = improved_future.result()
+            else:
+                improved_message = self.improve_message_with_openai(original_message)
             
             # Se OpenAI ha migliorato il messaggio, usalo con HTML
             # altrimenti usa il formato originale con escape HTML
@@ -3937,18 +3707,9 @@ class AmazonBot:
                 logger.info("Using improved message with OpenAI with HTML formatting")
             else:
                 # Usa il formato originale con escape HTML
-                escaped_title = self.escape_html(title)
-                escaped_category = self.escape_html(category_name)
-                escaped_original = self.escape_html(original_price)
-                escaped_discounted = self.escape_html(discounted_price)
-                
-                notification_text = f"🔥 <b>" + self.get_text('nuovo_sconto_rilevato') + "</b> 🔥\n\n"
-                notification_text += f"📦 <b>" + escaped_title + "</b>\n\n"
-                notification_text += f"📂 " + self.get_text('categoria') + ": <b>" + escaped_category + "</b>\n"
-                notification_text += f"💰 " + self.get_text('sconto') + ": <b>-" + discount_percentage + "%</b>\n"
-                notification_text += f"💲 " + self.get_text('prezzo_originale') + ": <s>" + escaped_original + "</s>\n"
-                notification_text += f"💲 " + self.get_text('prezzo_scontato') + ": <b>" + escaped_discounted + "</b>\n\n"
-                notification_text += f"🔗 <a href='{amazon_url}'>" + self.get_text('vai_al_prodotto') + "</a>"
+                notification_text = self._discount_notification_html(
+                    title, category_name, discount_percentage, original_price, discounted_price, amazon_url
+                )
                 use_html = True
                 logger.info("Using original message with HTML formatting")
             
@@ -3970,19 +3731,16 @@ class AmazonBot:
             else:
                 logger.info("Message sent to approval channel WITHOUT approval button (auto approval enabled)")
             
-            # Aggiungi sempre il pulsante con link di affiliazione
-            affiliate_url = self.add_affiliate_tag_to_url(amazon_url)
-            purchase_text = self.get_purchase_button_text()
-            affiliate_btn = types.InlineKeyboardButton(
-                purchase_text, 
-                url=affiliate_url
-            )
-            keyboard.add(affiliate_btn)
+            # Aggiungi sempre il pulsante con link di affiliazione (riusato anche per il gruppo)
+            purchase_button = self._purchase_button(amazon_url)
+            keyboard.add(purchase_button)
             
             # Invia messaggio con o senza immagine (sempre con HTML)
-            if image_url:
+            self._wait_for_send_slot(chat_id)
+            if image_url and image_url not in self._bad_image_urls:
                 try:
-                    sent_message = self.bot.send_photo(
+                    sent_message = self._with_flood_retry(
+                        self.bot.send_photo,
                         chat_id,
                         image_url,
                         caption=notification_text,
@@ -3991,14 +3749,17 @@ class AmazonBot:
                     )
                 except Exception as e:
                     logger.error(f"Error sending photo: {e}, sending only text")
-                    sent_message = self.bot.send_message(
+                    self._remember_bad_image_url(image_url, e)
+                    sent_message = self._with_flood_retry(
+                        self.bot.send_message,
                         chat_id,
                         notification_text,
                         parse_mode='HTML',
                         reply_markup=keyboard
                     )
             else:
-                sent_message = self.bot.send_message(
+                sent_message = self._with_flood_retry(
+                    self.bot.send_message,
                     chat_id,
                     notification_text,
                     parse_mode='HTML',
@@ -4025,16 +3786,25 @@ class AmazonBot:
                         if success:
                             logger.info(f"Message approved automatically for product {product_id}")
                             
-                            # Ottieni i dati del prodotto per la pubblicazione
-                            product = self.db.get_product_by_id(product_id)
-                            discount = self.db.get_latest_discount_for_product(product_id)
+                            # Dati del prodotto per la pubblicazione: già noti dal controllo appena eseguito
+                            product = product_data.get('product') or self.db.get_product_by_id(product_id)
                             
-                            if product and discount:
+                            if product:
                                 # Pubblica automaticamente sul gruppo finale
-                                self.send_approved_message_to_group(product, discount, improved_msg_to_save)
+                                source_message = (
+                                    (sent_message.chat.id, sent_message.message_id)
+                                    if sent_message.content_type == 'photo' else None
+                                )
+                                self.send_approved_message_to_group(
+                                    product,
+                                    (discount_percentage, original_price, discounted_price, None, None),
+                                    improved_msg_to_save,
+                                    source_message,
+                                    purchase_button
+                                )
                                 logger.info(f"✅ Message published automatically on group for product {product_id}")
                             else:
-                                logger.error(f"Unable to obtain product/discount data for automatic publication: {product_id}")
+                                logger.error(f"Unable to obtain product data for automatic publication: {product_id}")
                         else:
                             logger.error(f"Error in automatic approval for product {product_id}")
                 except Exception as auto_approval_error:
@@ -4043,6 +3813,20 @@ class AmazonBot:
         except Exception as e:
             logger.error(f"Error sending notification to channel: {e}")
     
+    def _purchase_button(self, amazon_url: str):
+        """Pulsante di acquisto con link di affiliazione, da calcolare una volta per offerta"""
+        return types.InlineKeyboardButton(self.get_purchase_button_text(), url=self.add_affiliate_tag_to_url(amazon_url))
+    
+    def _amazon_button_url(self, reply_markup) -> str:
+        """URL del primo pulsante Amazon della keyboard, se presente"""
+        if not reply_markup or not reply_markup.keyboard:
+            return None
+        return next(
+            (button.url for row in reply_markup.keyboard for button in row
+             if button.url and "amazon" in button.url.lower()),
+            None
+        )
+    
     def approve_discount_notification(self, call, approval_data: str):
         """Gestisce l'approvazione di una notifica sconto"""
         try:
@@ -4072,15 +3856,8 @@ class AmazonBot:
                 keyboard = types.InlineKeyboardMarkup()
                 approved_btn = types.InlineKeyboardButton("✅ " + self.get_text('già_approvato'), callback_data="already_approved")
                 
-                # Mantieni il pulsante Amazon (prendi l'URL dal pulsante originale se esiste)
-                original_keyboard = call.message.reply_markup
-                amazon_url = None
-                if original_keyboard and original_keyboard.keyboard:
-                    for row in original_keyboard.keyboard:
-                        for button in row:
-                            if button.url and "amazon" in button.url.lower():
-                                amazon_url = button.url
-                                break
+                # Mantieni il pulsante Amazon (URL preso dal pulsante originale, se esiste)
+                amazon_url = self._amazon_button_url(call.message.reply_markup)
                 
                 keyboard.add(approved_btn)
                 
@@ -4133,8 +3910,15 @@ class AmazonBot:
                 
                 discount_percentage, original_price, discounted_price, currency, detected_at = discount
                 
+                # Pulsante Amazon ricostruito dal prodotto appena letto, uguale per gruppo e canale
+                purchase_button = self._purchase_button(amazon_url) if amazon_url else None
+                
                 # Invia messaggio approvato al gruppo della categoria
-                self.send_approved_message_to_group(product, discount, improved_message)
+                source_message = (
+                    (call.message.chat.id, call.message.message_id)
+                    if call.message.content_type == 'photo' else None
+                )
+                self.send_approved_message_to_group(product, discount, improved_message, source_message, purchase_button)
                 
                 # Aggiorna il messaggio nel canale
                 approved_text = f"✅ <b>" + self.get_text('approvato_da') + " " + call.from_user.first_name + "</b>\n\n"
@@ -4145,23 +3929,11 @@ class AmazonBot:
                 keyboard = types.InlineKeyboardMarkup()
                 approved_btn = types.InlineKeyboardButton("✅ " + self.get_text('già_approvato'), callback_data="already_approved")
                 
-                # Mantieni il pulsante Amazon (prendi l'URL dal pulsante originale se esiste)
-                original_keyboard = call.message.reply_markup
-                amazon_url = None
-                if original_keyboard and original_keyboard.keyboard:
-                    for row in original_keyboard.keyboard:
-                        for button in row:
-                            if button.url and "amazon" in button.url.lower():
-                                amazon_url = button.url
-                                break
-                
                 keyboard.add(approved_btn)
                 
-                # Aggiungi il pulsante Amazon se esisteva
-                if amazon_url:
-                    purchase_text = self.get_purchase_button_text()
-                    amazon_btn = types.InlineKeyboardButton(purchase_text, url=amazon_url)
-                    keyboard.add(amazon_btn)
+                # Aggiungi il pulsante Amazon
+                if purchase_button:
+                    keyboard.add(purchase_button)
                 
                 try:
                     logger.info(f"Updating message in approval channel - ID: {call.message.message_id}")
@@ -4201,8 +3973,9 @@ class AmazonBot:
             logger.error(f"Error in approval: {e}")
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_interno'))
     
-    def send_approved_message_to_group(self, product_data: tuple, discount_data: tuple, improved_message: str = None):
-        """Invia il messaggio approvato al gruppo della categoria"""
+    def send_approved_message_to_group(self, product_data: tuple, discount_data: tuple, improved_message: str = None,
+                                       source_message: tuple = None, purchase_button=None):
+        """Invia il messaggio approvato al gruppo della categoria (source_message: post con foto del canale da copiare)"""
         try:
             product_id_db, amazon_url, title, image_url, category_id, added_by, created_at, category_name = product_data
             discount_percentage, original_price, discounted_price, currency, detected_at = discount_data
@@ -4229,9 +4002,9 @@ class AmazonBot:
                 
                 # Rimuovi eventuali link testuali dall'AI (per evitare placeholder)
                 # Rimuovi pattern come "🔗 Link prodotto: [url]" o simili
-                group_text = re.sub(r'🔗\s*[Ll]ink\s+prodotto\s*:\s*\S+', '', group_text)
-                group_text = re.sub(r'🔗\s*[Ll]ink\s*:\s*\S+', '', group_text)
-                group_text = re.sub(r'\n\n\n+', '\n\n', group_text)  # Rimuovi righe vuote extra
+                group_text = _PRODUCT_LINK_LINE_RE.sub('', group_text)
+                group_text = _LINK_LINE_RE.sub('', group_text)
+                group_text = _EXTRA_BLANK_LINES_RE.sub('\n\n', group_text)  # Rimuovi righe vuote extra
                 group_text = group_text.strip()
                 
                 use_html = True  # I messaggi AI usano formattazione HTML
@@ -4242,51 +4015,70 @@ class AmazonBot:
                 escaped_original = self.escape_html(original_price)
                 escaped_discounted = self.escape_html(discounted_price)
                 
-                group_text = f"🔥 <b>OFFERTA SPECIALE</b> 🔥\n\n"
-                group_text += f"📦 <b>{escaped_title}</b>\n\n"
-                group_text += f"💰 " + self.get_text('sconto') + ": <b>-{discount_percentage}%</b>\n"
-                group_text += f"💲 " + self.get_text('prezzo_originale') + ": <s>{escaped_original}</s>\n"
-                group_text += f"💲 " + self.get_text('prezzo_scontato') + ": <b>{escaped_discounted}</b>\n\n"
-                group_text += f"⚡️ <i>" + self.get_text('offerta_limitata_nel_tempo') + "</i>"
+                group_text = (
+                    f"🔥 <b>OFFERTA SPECIALE</b> 🔥\n\n"
+                    f"📦 <b>{escaped_title}</b>\n\n"
+                    f"💰 {self.get_text('sconto')}: <b>-{discount_percentage}%</b>\n"
+                    f"💲 {self.get_text('prezzo_originale')}: <s>{escaped_original}</s>\n"
+                    f"💲 {self.get_text('prezzo_scontato')}: <b>{escaped_discounted}</b>\n\n"
+                    f"⚡️ <i>{self.get_text('offerta_limitata_nel_tempo')}</i>"
+                )
                 
                 use_html = True
                 logger.info("Using standard message with HTML formatting for group")
             
-            # Crea keyboard con bottone "Acquista su Amazon" (come nel canale DB)
+            # Crea keyboard con bottone "Acquista su Amazon" (come nel canale DB, riusato se già pronto)
             keyboard = types.InlineKeyboardMarkup()
-            affiliate_url = self.add_affiliate_tag_to_url(amazon_url)
-            purchase_text = self.get_purchase_button_text()
-            affiliate_btn = types.InlineKeyboardButton(
-                purchase_text, 
-                url=affiliate_url
-            )
-            keyboard.add(affiliate_btn)
+            keyboard.add(purchase_button or self._purchase_button(amazon_url))
             
             # Invia al gruppo della categoria CON IL BOTTONE (sempre con HTML)
-            if image_url:
+            self._wait_for_send_slot(group_chat_id)
+            copied = False
+            if image_url and source_message:
+                # Copia il post del canale: Telegram riusa la foto già caricata, senza riscaricarla
                 try:
-                    self.bot.send_photo(
+                    self._with_flood_retry(
+                        self.bot.copy_message,
                         group_chat_id,
-                        image_url,
+                        source_message[0],
+                        source_message[1],
                         caption=group_text,
                         parse_mode='HTML',
                         reply_markup=keyboard
                     )
+                    copied = True
                 except Exception as e:
-                    logger.error(f"Error sending photo to group: {e}, sending only text")
-                    self.bot.send_message(
+                    logger.warning(f"Error copying channel message to group: {e}, sending photo")
+            
+            if not copied:
+                if image_url and image_url not in self._bad_image_urls:
+                    try:
+                        self._with_flood_retry(
+                            self.bot.send_photo,
+                            group_chat_id,
+                            image_url,
+                            caption=group_text,
+                            parse_mode='HTML',
+                            reply_markup=keyboard
+                        )
+                    except Exception as e:
+                        logger.error(f"Error sending photo to group: {e}, sending only text")
+                        self._remember_bad_image_url(image_url, e)
+                        self._with_flood_retry(
+                            self.bot.send_message,
+                            group_chat_id,
+                            group_text,
+                            parse_mode='HTML',
+                            reply_markup=keyboard
+                        )
+                else:
+                    self._with_flood_retry(
+                        self.bot.send_message,
                         group_chat_id,
                         group_text,
                         parse_mode='HTML',
                         reply_markup=keyboard
                     )
-            else:
-                self.bot.send_message(
-                    group_chat_id,
-                    group_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
             
             logger.info(f"Message approved sent to group {telegram_link} for product {product_id_db}")
             
@@ -4311,34 +4103,15 @@ class AmazonBot:
         test_text = f"🧪 <b>" + self.get_text('test_prompt_ai') + "</b>\n\n"
         test_text += f"📂 <b>" + self.get_text('seleziona_una_categoria') + ":</b>"
         
-        # Crea keyboard con le categorie
-        keyboard = types.InlineKeyboardMarkup(row_width=1)
-        
-        for cat_id, name, description, telegram_link, created_by, created_at in categories:
-            button_text = f"📂 {name}"
-            callback_data = f"test_category_{cat_id}"
-            button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
-            keyboard.add(button)
-        
-        # Bottone annulla
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_test_prompt")
-        keyboard.add(cancel_btn)
+        # Crea keyboard con le categorie (una riga per categoria) e il bottone annulla
+        rows = [
+            [types.InlineKeyboardButton(f"📂 {category[1]}", callback_data=f"test_category_{category[0]}")]
+            for category in categories
+        ]
+        rows.append([types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_test_prompt")])
+        keyboard = types.InlineKeyboardMarkup(rows, row_width=1)
         
-        try:
-            self.bot.edit_message_text(
-                test_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            self.bot.send_message(
-                call.message.chat.id,
-                test_text,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
+        self._safe_edit_or_send(call, test_text, 'HTML', keyboard)
         
         self.bot.answer_callback_query(call.id, "🧪 " + self.get_text('scegli_categoria'))
     
@@ -4353,77 +4126,43 @@ class AmazonBot:
         
         if not products:
             test_text = f"🧪 <b>" + self.get_text('test_prompt_ai') + "</b>\n\n"
-            test_text += f"📂 " + self.get_text('categoria') + ": <b>{category[1]}</b>\n\n"
+            test_text += f"📂 {self.get_text('categoria')}: <b>{self.escape_html(category[1])}</b>\n\n"
             test_text += f"❌ <b>" + self.get_text('nessun_prodotto_disponibile') + "</b>\n\n"
             test_text += f"{self.get_text('aggiungi_prima_dei_prodotti_a_questa_categoria')}."
             
-            keyboard = types.InlineKeyboardMarkup()
-            back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('torna_alle_categorie'), callback_data="test_prompt")
-            cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_test_prompt")
-            keyboard.add(back_btn)
-            keyboard.add(cancel_btn)
+            keyboard = self._nav_keyboard('test_products_nav')
             
-            try:
-                self.bot.edit_message_text(
-                    test_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    test_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+            self._safe_edit_or_send(call, test_text, 'HTML', keyboard)
             
             self.bot.answer_callback_query(call.id, "❌ " + self.get_text('nessun_prodotto'))
             return
         
-        test_text = f"🧪 <b>" + {self.get_text('test_prompt_ai')} + "</b>\n\n"
-        test_text += f"📂 " + self.get_text('categoria') + ": <b>{category[1]}</b>\n\n"
+        test_text = f"🧪 <b>{self.get_text('test_prompt_ai')}</b>\n\n"
+        test_text += f"📂 {self.get_text('categoria')}: <b>{self.escape_html(category[1])}</b>\n\n"
         test_text += f"🛒 <b>" + self.get_text('seleziona_un_prodotto') + ":</b>"
         
-        # Crea keyboard con i prodotti
-        keyboard = types.InlineKeyboardMarkup(row_width=1)
+        # Crea keyboard con i prodotti: una riga per prodotto, righe costruite in un'unica passata
+        product_label = self.get_text('prodotto')
+        rows = [
+            [types.InlineKeyboardButton(
+                f"🛒 {_truncate(product_title)}",
+                callback_data=f"test_product_{product_id}"
+            )]
+            for product_id, product_title in (
+                (product[0], product[2] or f"{product_label} {product[0]}") for product in products
+            )
+        ]
         
-        for product_id, amazon_url, title, added_by, created_at in products:
-            product_title = title if title else f"{self.get_text('prodotto')} " + {product_id}
-            button_text = f"🛒 {product_title[:50]}{'...' if len(product_title) > 50 else ''}"
-            callback_data = f"test_product_{product_id}"
-            button = types.InlineKeyboardButton(button_text, callback_data=callback_data)
-            keyboard.add(button)
-            
         # Bottoni navigazione
-        back_btn = types.InlineKeyboardButton("🔙 " + self.get_text('torna_alle_categorie'), callback_data="test_prompt")
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_test_prompt")
-        keyboard.add(back_btn)
-        keyboard.add(cancel_btn)
+        rows.extend(self._nav_keyboard('test_products_nav').keyboard)
+        keyboard = types.InlineKeyboardMarkup(rows, row_width=1)
         
-        try:
-            self.bot.edit_message_text(
-                test_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
-        except Exception as e:
-            self.bot.send_message(
-                call.message.chat.id,
-                test_text,
-                parse_mode='HTML',
-                reply_markup=keyboard
-            )
+        self._safe_edit_or_send(call, test_text, 'HTML', keyboard)
         
         self.bot.answer_callback_query(call.id, "🛒 " + self.get_text('scegli_prodotto'))
     
     def execute_prompt_test(self, call, product_id: int):
         """Esegue il test del prompt su un prodotto specifico"""
-        import random
-        
         # Ottieni dati prodotto
         product = self.db.get_product_by_id(product_id)
         if not product:
@@ -4432,41 +4171,29 @@ class AmazonBot:
         
         product_id_db, amazon_url, title, image_url, category_id, added_by, created_at, category_name = product
         
+        # Lo scraping parte subito, in parallelo al messaggio di caricamento e alla risposta alla callback
+        scrape_future = self._prompt_test_executor.submit(self._scrape_for_prompt_test, amazon_url)
+        
         # Mostra messaggio di caricamento
-        loading_text = f"🧪 <b>" + self.get_text('esecuzione_test_prompt_ai') + "</b>\n\n"
-        loading_text += f"⏳ " + self.get_text('sto_testando_il_prompt_su') + ":\n"
-        loading_text += f"📦 <b>" + self.escape_html(title or self.get_text('prodotto_amazon')) + "</b>\n\n"
-        loading_text += f"🔄 " + self.get_text('generazione_dati_di_test_e_chiamata_openai') + "..."
+        loading_text = (
+            f"🧪 <b>{self.get_text('esecuzione_test_prompt_ai')}</b>\n\n"
+            f"⏳ {self.get_text('sto_testando_il_prompt_su')}:\n"
+            f"📦 <b>{self.escape_html(title or self.get_text('prodotto_amazon'))}</b>\n\n"
+            f"🔄 {self.get_text('generazione_dati_di_test_e_chiamata_openai')}..."
+        )
         
-        try:
-            self.bot.edit_message_text(
-                loading_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            self.bot.send_message(
-                call.message.chat.id,
-                loading_text,
-                parse_mode='HTML'
-            )
+        self._safe_edit_or_send(call, loading_text, 'HTML')
         
         self.bot.answer_callback_query(call.id, "🧪 " + self.get_text('test_in_corso') + "...")
         
-        # Tenta di fare scraping reale, se fallisce usa dati fittizi
-        try:
-            scrape_data = self.scrape_amazon_product(amazon_url)
-            if scrape_data.get('has_discount', False):
-                # Usa dati reali
-                discount_percentage = scrape_data['discount_percentage']
-                original_price = scrape_data['original_price']
-                discounted_price = scrape_data['discounted_price']
-                test_data_source = "🔍 " + self.get_text('dati_reali_da_amazon')
-            else:
-                # Usa dati fittizi
-                raise Exception(self.get_text('nessuno_sconto_reale_trovato'))
-        except:
+        # Usa i dati reali se la pagina mostra uno sconto, altrimenti dati fittizi
+        scrape_data = scrape_future.result()
+        if scrape_data.get('has_discount', False):
+            discount_percentage = scrape_data['discount_percentage']
+            original_price = scrape_data['original_price']
+            discounted_price = scrape_data['discounted_price']
+            test_data_source = "🔍 " + self.get_text('dati_reali_da_amazon')
+        else:
             # Genera dati fittizi per il test
             discount_percentage = random.randint(10, 50)
             original_price_value = random.randint(50, 500)
@@ -4475,13 +4202,14 @@ class AmazonBot:
             discounted_price = f"{discounted_price_value:.2f}€".replace('.', ',')
             test_data_source = "🎲 " + self.get_text('dati_fittizi_per_test')
         
-        # Crea il messaggio originale (stesso formato del cronjob)
-        original_message = f"🔥 " + self.get_text('nuovo_sconto_rilevato') + " 🔥\n\n"
-        original_message += f"📦 " + title or self.get_text('prodotto_amazon') + "\n\n"
-        original_message += f"📂 " + self.get_text('categoria') + ": " + category_name or self.get_text('senza_categoria') + "\n"
-        original_message += f"💰 " + self.get_text('sconto') + ": -{discount_percentage}%\n"
-        original_message += f"💲 " + self.get_text('prezzo_originale') + ": " + original_price + "\n"
-        original_message += f"💲 " + self.get_text('prezzo_scontato') + ": " + discounted_price
+        # Crea il messaggio originale con lo stesso template del cronjob
+        original_message = self._discount_original_message({
+            'title': title or self.get_text('prodotto_amazon'),
+            'category_name': category_name or self.get_text('senza_categoria'),
+            'discount_percentage': discount_percentage,
+            'original_price': original_price,
+            'discounted_price': discounted_price
+        })
         
         # Migliora il messaggio con OpenAI
         improved_message = self.improve_message_with_openai(original_message)
@@ -4493,31 +4221,18 @@ class AmazonBot:
             logger.info("Test: using improved message with OpenAI with HTML formatting")
         else:
             # Usa il formato originale con escape HTML (stesso fallback del canale DB)
-            escaped_title = self.escape_html(title or self.get_text('prodotto_amazon'))
-            escaped_category = self.escape_html(category_name or self.get_text('senza_categoria'))
-            escaped_original = self.escape_html(original_price)
-            escaped_discounted = self.escape_html(discounted_price)
-            
-            notification_text = f"🔥 <b>" + self.get_text('nuovo_sconto_rilevato') + "</b> 🔥\n\n"
-            notification_text += f"📦 <b>{escaped_title}</b>\n\n"
-            notification_text += f"📂 " + self.get_text('categoria') + ": <b>{escaped_category}</b>\n"
-            notification_text += f"💰 " + self.get_text('sconto') + ": <b>-{discount_percentage}%</b>\n"
-            notification_text += f"💲 " + self.get_text('prezzo_originale') + ": <s>{escaped_original}</s>\n"
-            notification_text += f"💲 " + self.get_text('prezzo_scontato') + ": <b>{escaped_discounted}</b>\n\n"
-            notification_text += f"🔗 <a href='{amazon_url}'>{self.get_text('vai_al_prodotto')}</a>"
+            notification_text = self._discount_notification_html(
+                title or self.get_text('prodotto_amazon'),
+                category_name or self.get_text('senza_categoria'),
+                discount_percentage, original_price, discounted_price, amazon_url
+            )
             logger.info("Test: using original message with HTML formatting")
         
         # Keyboard con opzioni (stesso formato del canale DB + pulsanti navigazione)
         keyboard = types.InlineKeyboardMarkup()
         
         # Aggiungi il pulsante con link di affiliazione (STESSO del canale DB)
-        affiliate_url = self.add_affiliate_tag_to_url(amazon_url)
-        purchase_text = self.get_purchase_button_text()
-        affiliate_btn = types.InlineKeyboardButton(
-            purchase_text, 
-            url=affiliate_url
-        )
-        keyboard.add(affiliate_btn)
+        keyboard.add(self._purchase_button(amazon_url))
         
         # Pulsanti di navigazione del test (invece dei pulsanti di approvazione)
         modify_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('modifica_prompt'), callback_data="start_prompt_config")
@@ -4526,7 +4241,7 @@ class AmazonBot:
         keyboard.add(modify_btn, menu_btn)
         
         # Invia il messaggio ESATTAMENTE come nel canale database (con foto se disponibile)
-        if image_url:
+        if image_url and image_url not in self._bad_image_urls:
             try:
                 # Usa send_photo come nel canale DB
                 self.bot.send_photo(
@@ -4539,99 +4254,42 @@ class AmazonBot:
                 # Elimina il messaggio di caricamento
                 try:
                     self.bot.delete_message(call.message.chat.id, call.message.message_id)
-                except:
-                    pass
+                except telebot.apihelper.ApiTelegramException:
+                    pass  # Già eliminato o troppo vecchio per essere eliminato
             except Exception as e:
                 logger.error(f"Test: error sending photo: {e}, sending only text")
+                self._remember_bad_image_url(image_url, e)
                 # Fallback a solo testo, come nel canale DB
-                try:
-                    self.bot.edit_message_text(
-                        notification_text,
-                        call.message.chat.id,
-                        call.message.message_id,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
-                except Exception as e2:
-                    self.bot.send_message(
-                        call.message.chat.id,
-                        notification_text,
-                        parse_mode='HTML',
-                        reply_markup=keyboard
-                    )
+                self._safe_edit_or_send(call, notification_text, 'HTML', keyboard)
         else:
             # Nessuna immagine, usa send_message come nel canale DB
-            try:
-                self.bot.edit_message_text(
-                    notification_text,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
-            except Exception as e:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    notification_text,
-                    parse_mode='HTML',
-                    reply_markup=keyboard
-                )
+            self._safe_edit_or_send(call, notification_text, 'HTML', keyboard)
         
         logger.info(f"Test prompt executed by user {call.from_user.id} for product {product_id}")
 
-    def show_purchase_button_config_edit(self, call):
-        """Mostra configurazione testo pulsante di acquisto (edit message)"""
+    def _purchase_button_screen(self) -> str:
+        """Testo della schermata del pulsante di acquisto, con il testo attuale in un unico messaggio"""
         config = self.db.get_purchase_button_config()
         
         if config:
             button_text, is_active, created_by, created_at, updated_at = config
-            
-            config_text = f"🛒 <b>" + self.get_text('configurazione_pulsante_di_acquisto') + "</b>\n\n"
-            if created_by:
-                config_text += f"👤 " + self.get_text('configurato_da') + ": " + str(created_by) + "\n"
-            if updated_at:
-                config_text += f"🔄 " + self.get_text('aggiornato') + ": " + updated_at[:16] + "\n\n"
-            else:
-                config_text += f"\n"
-            config_text += f"⬇️ " + self.get_text('testo_attuale_mostrato_nel_messaggio_sotto')
+            configured_by = f"👤 {self.get_text('configurato_da')}: {created_by}\n" if created_by else ""
+            updated = f"🔄 {self.get_text('aggiornato')}: {updated_at[:16]}\n" if updated_at else ""
         else:
-            config_text = f"🛒 <b>" + self.get_text('configurazione_pulsante_di_acquisto') + "</b>\n\n"
-            config_text += f"⬇️ " + self.get_text('testo_attuale_mostrato_nel_messaggio_sotto')
             button_text = self.get_text('default_purchase_button')  # Default tradotto
+            configured_by = updated = ""
         
-        try:
-            self.bot.edit_message_text(
-                config_text,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            logger.error(f"Error modifying purchase button message: {e}")
-        
-        # Invia il testo attuale del pulsante in un messaggio separato
-        if button_text:
-            button_message = f"<code>{self.escape_html(button_text)}</code>"
-            
-            # Keyboard per il messaggio del testo pulsante
-            keyboard_button = types.InlineKeyboardMarkup()
-            modify_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('modifica_testo'), callback_data="start_purchase_button_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard_button.add(modify_btn)
-            keyboard_button.add(menu_btn)
-            
-            # Invia il messaggio del testo pulsante separatamente
-            try:
-                self.bot.send_message(
-                    call.message.chat.id,
-                    button_message,
-                    parse_mode='HTML',
-                    reply_markup=keyboard_button
-                )
-            except Exception as e:
-                logger.error(f"Error sending purchase button message: {e}")
-        
+        return (
+            f"🛒 <b>{self.get_text('configurazione_pulsante_di_acquisto')}</b>\n\n"
+            f"{configured_by}{updated}\n"
+            f"⬇️ {self.get_text('testo_attuale_del_pulsante')}\n\n"
+            f"<code>{self.escape_html(button_text or self.get_text('default_purchase_button'))}</code>"
+        )
+    
+    def show_purchase_button_config_edit(self, call):
+        """Mostra configurazione testo pulsante di acquisto (edit message)"""
         self.bot.answer_callback_query(call.id, "🛒 " + self.get_text('pulsante_di_acquisto'))
+        self._safe_edit_or_send(call, self._purchase_button_screen(), 'HTML', self._nav_keyboard('purchase_nav'))
     
     def start_purchase_button_configuration(self, call):
         """Avvia il processo di configurazione del testo del pulsante di acquisto"""
@@ -4646,9 +4304,7 @@ class AmazonBot:
         config_text += f"• 💰 " + self.get_text('offerta_speciale') + "\n"
         config_text += f"• 🔥 " + self.get_text('approfitta_dell_offerta')
         
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annulla'), callback_data="cancel_purchase_button_config")
-        keyboard.add(cancel_btn)
+        keyboard = self._cancel_keyboard('cancel_purchase_button_config')
         
         try:
             self.bot.edit_message_text(
@@ -4694,17 +4350,13 @@ class AmazonBot:
             self.db.update_purchase_button_config(button_text, user_id)
             
             # Rimuovi lo stato utente
-            del self.user_states[user_id]
+            self.user_states.pop(user_id, None)
             
             success_text = f"✅ <b>" + self.get_text('testo_pulsante_aggiornato') + "</b>\n\n"
             success_text += f"🛒 " + self.get_text('nuovo_testo') + ": <code>" + self.escape_html(button_text) + "</code>\n\n"
             success_text += f"💡 " + self.get_text('il_nuovo_testo_verrà_utilizzato_in_tutti_i_messaggi_di_sconto') + "."
             
-            keyboard = types.InlineKeyboardMarkup()
-            config_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('configura_pulsante'), callback_data="show_purchase_button_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard.add(config_btn)
-            keyboard.add(menu_btn)
+            keyboard = self._nav_keyboard('purchase_saved_nav')
             
             self.bot.send_message(
                 message.chat.id,
@@ -4724,50 +4376,21 @@ class AmazonBot:
             )
     
     def cancel_purchase_button_config(self, call):
-        """Annulla la configurazione del pulsante e torna al messaggio del testo pulsante"""
+        """Annulla la configurazione del pulsante e torna alla schermata del pulsante di acquisto"""
         user_id = call.from_user.id
         
         # Rimuovi lo stato utente se esiste
-        if user_id in self.user_states:
-            del self.user_states[user_id]
-        
-        # Ottieni il testo del pulsante attuale
-        config = self.db.get_purchase_button_config()
-        if config:
-            button_text = config[0]  # button_text
-        else:
-            button_text = self.get_text('default_purchase_button')  # Default tradotto
-        
-        # Modifica il messaggio corrente per mostrare il testo del pulsante
-        button_message = f"<code>{self.escape_html(button_text)}</code>"
-        
-        # Keyboard per il messaggio del testo pulsante
-        keyboard_button = types.InlineKeyboardMarkup()
-        modify_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('modifica_testo'), callback_data="start_purchase_button_config")
-        menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-        keyboard_button.add(modify_btn)
-        keyboard_button.add(menu_btn)
-        
-        try:
-            self.bot.edit_message_text(
-                button_message,
-                call.message.chat.id,
-                call.message.message_id,
-                parse_mode='HTML',
-                reply_markup=keyboard_button
-            )
-        except Exception as e:
-            logger.error(f"Error modifying purchase button message: {e}")
+        self.user_states.pop(user_id, None)
         
         self.bot.answer_callback_query(call.id, "❌ " + self.get_text('annullo'))
+        self._safe_edit_or_send(call, self._purchase_button_screen(), 'HTML', self._nav_keyboard('purchase_nav'))
     
     def cancel_prompt_config(self, call):
         """Annulla la configurazione del prompt e torna al messaggio del prompt"""
         user_id = call.from_user.id
         
         # Rimuovi lo stato utente se esiste
-        if user_id in self.user_states:
-            del self.user_states[user_id]
+        self.user_states.pop(user_id, None)
         
         # Ottieni il prompt attuale
         config = self.db.get_openai_prompt_config()
@@ -4779,45 +4402,17 @@ class AmazonBot:
             prompt_message += f"<code>{self.escape_html(prompt_text)}</code>"
             
             # Keyboard per il messaggio del prompt (con tutti i pulsanti originali)
-            keyboard_prompt = types.InlineKeyboardMarkup()
-            test_btn = types.InlineKeyboardButton("🧪 " + self.get_text('testa_prompt'), callback_data="test_prompt")
-            modify_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('modifica_prompt'), callback_data="start_prompt_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard_prompt.add(test_btn)
-            keyboard_prompt.add(modify_btn)
-            keyboard_prompt.add(menu_btn)
+            keyboard_prompt = self._nav_keyboard('prompt_nav')
             
-            try:
-                self.bot.edit_message_text(
-                    prompt_message,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard_prompt
-                )
-            except Exception as e:
-                logger.error(f"Error modifying prompt message: {e}")
+            self._safe_edit_or_send(call, prompt_message, 'HTML', keyboard_prompt)
         else:
             # Se non c'è prompt configurato, mostra messaggio di default
             no_prompt_message = f"🤖 <b>" + self.get_text('nessun_prompt_configurato') + "</b>\n\n"
             no_prompt_message += f"📝 " + self.get_text('configura_un_prompt_personalizzato_per_migliorare_i_messaggi_di_sconto_con_openai') + "."
             
-            keyboard_no_prompt = types.InlineKeyboardMarkup()
-            config_btn = types.InlineKeyboardButton("➕ " + self.get_text('configura_prompt'), callback_data="start_prompt_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard_no_prompt.add(config_btn)
-            keyboard_no_prompt.add(menu_btn)
+            keyboard_no_prompt = self._nav_keyboard('no_prompt_nav')
             
-            try:
-                self.bot.edit_message_text(
-                    no_prompt_message,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard_no_prompt
-                )
-            except Exception as e:
-                logger.error(f"Error modifying no prompt message: {e}")
+            self._safe_edit_or_send(call, no_prompt_message, 'HTML', keyboard_no_prompt)
         
         self.bot.answer_callback_query(call.id, "❌ " + self.get_text('annullo'))
     
@@ -4833,45 +4428,17 @@ class AmazonBot:
             prompt_message += f"<code>{self.escape_html(prompt_text)}</code>"
             
             # Keyboard per il messaggio del prompt (con tutti i pulsanti originali)
-            keyboard_prompt = types.InlineKeyboardMarkup()
-            test_btn = types.InlineKeyboardButton("🧪 " + self.get_text('testa_prompt'), callback_data="test_prompt")
-            modify_btn = types.InlineKeyboardButton("⚙️ " + self.get_text('modifica_prompt'), callback_data="start_prompt_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard_prompt.add(test_btn)
-            keyboard_prompt.add(modify_btn)
-            keyboard_prompt.add(menu_btn)
+            keyboard_prompt = self._nav_keyboard('prompt_nav')
             
-            try:
-                self.bot.edit_message_text(
-                    prompt_message,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard_prompt
-                )
-            except Exception as e:
-                logger.error(f"Error modifying prompt test message: {e}")
+            self._safe_edit_or_send(call, prompt_message, 'HTML', keyboard_prompt)
         else:
             # Se non c'è prompt configurato, mostra messaggio di default
             no_prompt_message = f"🤖 <b>" + self.get_text('nessun_prompt_configurato') + "</b>\n\n"
             no_prompt_message += f"📝 " + self.get_text('configura_un_prompt_personalizzato_per_migliorare_i_messaggi_di_sconto_con_openai') + "."
             
-            keyboard_no_prompt = types.InlineKeyboardMarkup()
-            config_btn = types.InlineKeyboardButton("➕ " + self.get_text('configura_prompt'), callback_data="start_prompt_config")
-            menu_btn = types.InlineKeyboardButton("🏠 " + self.get_text('menu_principale'), callback_data="back_to_main_menu")
-            keyboard_no_prompt.add(config_btn)
-            keyboard_no_prompt.add(menu_btn)
+            keyboard_no_prompt = self._nav_keyboard('no_prompt_nav')
             
-            try:
-                self.bot.edit_message_text(
-                    no_prompt_message,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    parse_mode='HTML',
-                    reply_markup=keyboard_no_prompt
-                )
-            except Exception as e:
-                logger.error(f"Error modifying no prompt test message: {e}")
+            self._safe_edit_or_send(call, no_prompt_message, 'HTML', keyboard_no_prompt)
         
         self.bot.answer_callback_query(call.id, "❌ " + self.get_text('test_annullato'))
     
@@ -4880,19 +4447,7 @@ class AmazonBot:
         user_id = call.from_user.id
         config = self.db.get_openai_prompt_config()
         
-        if config:
-            prompt_text, is_active, created_by, created_at, updated_at = config
-            status_text = "✅ " + self.get_text('attivo') if is_active else "❌ " + self.get_text('inattivo')
-            
-            config_text = f"🤖 <b>" + self.get_text('configurazione_prompt_openai') + "</b>\n\n"
-            config_text += f"📝 " + self.get_text('prompt_attuale') + ":\n<code>" + self.escape_html(prompt_text[:200]) + ("..." if len(prompt_text) > 200 else "") + "</code>\n\n"
-            config_text += f"📊 " + self.get_text('stato') + ": " + status_text + "\n\n"
-            config_text += f"💡 " + self.get_text('invia_il_nuovo_prompt_per_aggiornare_la_configurazione') + ":"
-        else:
-            config_text = f"🤖 <b>" + self.get_text('configurazione_prompt_openai') + "</b>\n\n"
-            config_text += f"❌ " + self.get_text('nessun_prompt_configurato') + "\n\n" + "\n\n"
-            config_text += f"📝 " + self.get_text('invia_il_prompt_personalizzato_che_openai_userà_per_migliorare_i_messaggi_degli_sconti') + ".\n\n"
-            config_text += f"💡 " + self.get_text('esempio') + ": '" + self.get_text('esempio_prompt') + "'."
+        config_text = self._prompt_config_text(config)
         
         self.user_states[user_id] = {
             'action': 'configuring_prompt',
@@ -4900,9 +4455,7 @@ class AmazonBot:
         }
         
         # Keyboard con bottone annulla
-        keyboard = types.InlineKeyboardMarkup()
-        cancel_btn = types.InlineKeyboardButton("❌ " + self.get_text('annullo'), callback_data="cancel_prompt_config")
-        keyboard.add(cancel_btn)
+        keyboard = self._cancel_keyboard('cancel_prompt_config')
         
         try:
             self.bot.edit_message_text(
@@ -4981,90 +4534,77 @@ class AmazonBot:
         return self.get_text('default_purchase_button')  # Default tradotto
 
     def show_language_settings(self, call):
-        """Mostra il menu delle impostazioni lingua"""
-        try:
-            current_lang = self.translator.get_current_language()
-            available_langs = self.translator.get_available_languages()
-            
-            if not available_langs:
-                self.bot.edit_message_text(
-                    self.get_text('no_languages_available'),
-                    call.message.chat.id,
-                    call.message.message_id
-                )
-                return
-            
+        """Mostra il menu delle impostazioni lingua (gli errori sono gestiti dal dispatcher delle callback)"""
+        # Conferma subito la callback: il client smette di mostrare il caricamento
+        self.bot.answer_callback_query(call.id)
+        
+        current_lang = self.translator.get_current_language()
+        available_langs = self.translator.get_available_languages()
+        
+        if not available_langs:
+            self._safe_edit_or_send(call, self.get_text('no_languages_available'))
+            return
+        
+        # Testo e keyboard dipendono solo dalla lingua corrente (cambia solo la riga con ✅): costruiti una volta per lingua
+        screen = self._language_screens.get(current_lang)
+        if screen is None:
             # Crea il messaggio con lingua corrente
             message_text = f"{self.get_text('current_language', language=current_lang)}\n\n{self.get_text('select_language')}"
             
-            # Crea keyboard con le lingue disponibili
-            keyboard = types.InlineKeyboardMarkup(row_width=2)
-            
+            rows = []
             for lang in available_langs:
                 display_name = self.translator.get_language_display_name(lang)
                 current_indicator = " ✅" if lang == current_lang else ""
                 button_text = f"{display_name}{current_indicator}"
                 callback_data = f"set_language_{lang}"
-                keyboard.add(types.InlineKeyboardButton(button_text, callback_data=callback_data))
+                rows.append([types.InlineKeyboardButton(button_text, callback_data=callback_data)])
             
             # Aggiungi pulsante indietro
-            keyboard.add(types.InlineKeyboardButton(
-                self.get_text('back'), 
-                callback_data="back_to_main_menu"
-            ))
-            
-            self.bot.edit_message_text(
-                message_text,
-                call.message.chat.id,
-                call.message.message_id,
-                reply_markup=keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_language_settings: {e}")
+            rows.extend(self._nav_keyboard('language_back_nav').keyboard)
+            screen = (message_text, types.InlineKeyboardMarkup(rows, row_width=2))
+            self._language_screens[current_lang] = screen
+        
+        message_text, keyboard = screen
+        self._safe_edit_or_send(call, message_text, reply_markup=keyboard)
     
     def set_language(self, call, language: str):
-        """Imposta una nuova lingua"""
-        try:
-            if self.translator.set_language(language):
-                # Lingua cambiata con successo
-                success_message = self.get_text('language_changed')
-                
-                # Mostra messaggio di conferma
-                keyboard = types.InlineKeyboardMarkup()
-                keyboard.add(types.InlineKeyboardButton(
-                    self.get_text('main_menu'), 
-                    callback_data="back_to_main_menu"
-                ))
-                
-                self.bot.edit_message_text(
-                    success_message,
-                    call.message.chat.id,
-                    call.message.message_id,
-                    reply_markup=keyboard
-                )
-                
-                logger.info(f"Language changed in {language} by user {call.from_user.id}")
-            else:
-                # Errore nel cambio lingua
-                self.bot.answer_callback_query(
-                    call.id, 
-                    f"❌ " + self.get_text('errore_nel_cambio_lingua') + ": " + language
-                )
-                
-        except Exception as e:
-            logger.error(f"Error in set_language: {e}")
-            self.bot.answer_callback_query(call.id, "❌ " + self.get_text('errore_interno'))
+        """Imposta una nuova lingua (gli errori sono gestiti dal dispatcher delle callback)"""
+        if not self.translator.set_language(language):
+            # Errore nel cambio lingua
+            self.bot.answer_callback_query(
+                call.id, 
+                f"❌ " + self.get_text('errore_nel_cambio_lingua') + ": " + language
+            )
+            return
+        
+        # Lingua cambiata con successo
+        success_message = self.get_text('language_changed')
+        
+        # Mostra messaggio di conferma (tastiera già nella nuova lingua)
+        keyboard = self._nav_keyboard('language_changed_nav')
+        
+        self.bot.answer_callback_query(call.id)
+        self._safe_edit_or_send(call, success_message, reply_markup=keyboard)
+        
+        logger.info(f"Language changed in {language} by user {call.from_user.id}")
 
     def run(self):
         """Avvia il bot"""
         logger.info("Starting bot...")
         try:
             logger.info("📡 Starting Telegram polling...")
-            self.bot.infinity_polling()
+            # Long polling da 50s (il timeout HTTP resta più lungo) e solo gli update gestiti dagli handler
+            self.bot.infinity_polling(
+                timeout=60,
+                long_polling_timeout=50,
+                allowed_updates=['message', 'callback_query']
+            )
         except Exception as e:
             logger.error(f"Error during bot execution: {e}")
             raise
+        finally:
+            # Registra le interazioni ancora in coda prima di uscire
+            self.db.close()
 
 if __name__ == "__main__":
     try:
@@ -1,10 +1,62 @@
-import os
+import logging
+import queue
+import threading
 from typing import Optional, List
+from cachetools import TTLCache
 from api_client import AffiliateAPIClient
 
+logger = logging.getLogger(__name__)
+
+# Campi delle risposte API, nell'ordine delle tuple restituite (stesso formato di SQLite)
+_PRODUCT_FIELDS = ('id', 'amazon_url', 'title', 'image_url', 'category_id', 'added_by', 'created_at', 'category_name')
+_CATEGORY_FIELDS = ('id', 'name', 'description', 'telegram_group_link', 'created_by', 'created_at')
+_CATEGORY_PRODUCT_FIELDS = ('id', 'amazon_url', 'title', 'added_by', 'created_at')
+_INTERACTION_FIELDS = ('command', 'message', 'timestamp')
+_ADMIN_USER_FIELDS = ('user_id', 'username', 'first_name', 'last_name', 'is_active', 'added_by', 'created_at')
+
 class DatabaseManager:
-    def __init__(self, db_path: str):
-        self.api_client = AffiliateAPIClient()
+    def __init__(self, api_client: AffiliateAPIClient = None):
+        self.api_client = api_client or AffiliateAPIClient()
+        # Cache di configurazioni, categorie, lista prodotti ed esiti delle verifiche admin: scade dopo 30 secondi
+        # e viene invalidata dai rispettivi update; la versione per chiave scarta le letture concorrenti a una scrittura
+        self._config_cache = TTLCache(maxsize=1024, ttl=30)
+        self._config_versions = {}
+        self._config_cache_lock = threading.Lock()
+        # Interazioni da registrare: un unico thread le invia all'API fuori dal percorso di risposta del bot
+        self._interaction_queue = queue.Queue(maxsize=1000)
+        self._interaction_writer = threading.Thread(
+            target=self._interaction_writer_loop,
+            name='interaction-writer',
+            daemon=True
+        )
+        self._interaction_writer.start()
+    
+    def _write_result(self, result: dict, operation: str, expected_error: str = None) -> bool:
+        """Esito di una scrittura tramite API: True se riuscita, False per l'errore atteso, altrimenti eccezione"""
+        if result.get('success'):
+            return True
+        
+        error = result.get('error', 'Unknown error')
+        if expected_error and expected_error in error.lower():
+            return False  # Es. risorsa non trovata o già esistente
+        raise Exception(f"Errore {operation}: {error}")
+    
+    def _cached(self, key: str):
+        """Valore in cache per la chiave (o None) e versione corrente, da passare a _cache_store"""
+        with self._config_cache_lock:
+            return self._config_cache.get(key), self._config_versions.get(key, 0)
+    
+    def _cache_store(self, key: str, value, version: int):
+        """Salva il valore letto solo se nessuna scrittura sulla chiave è avvenuta durante la richiesta"""
+        with self._config_cache_lock:
+            if self._config_versions.get(key, 0) == version:
+                self._config_cache[key] = value
+    
+    def _cache_invalidate(self, key: str):
+        """Invalida la chiave dopo una scrittura: anche le letture ancora in corso non la salveranno"""
+        with self._config_cache_lock:
+            self._config_versions[key] = self._config_versions.get(key, 0) + 1
+            self._config_cache.pop(key, None)
     
     def add_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None):
         """Aggiunge un nuovo utente al database tramite API"""
@@ -21,16 +73,41 @@ class DatabaseManager:
             raise Exception(f"Errore aggiunta utente: {result.get('error', 'Unknown error')}")
     
     def log_interaction(self, user_id: int, command: str, message: str = None):
-        """Registra un'interazione dell'utente tramite API"""
-        data = {
-            'command': command,
-            'message': message
-        }
-        
-        result = self.api_client.make_request('POST', f'/api/bot/users/{user_id}/interactions', data)
-        
-        if not result.get('success', False):
-            raise Exception(f"Errore log interaction: {result.get('error', 'Unknown error')}")
+        """Accoda un'interazione dell'utente, registrata tramite API dal thread dedicato"""
+        try:
+            self._interaction_queue.put_nowait((user_id, command, message))
+        except queue.Full:
+            logger.warning(f"Interaction queue full, dropping '{command}' for user {user_id}")
+    
+    def _interaction_writer_loop(self):
+        """Invia all'API le interazioni accodate, una alla volta, finché non riceve None"""
+        while True:
+            item = self._interaction_queue.get()
+            if item is None:
+                break
+            
+            user_id, command, message = item
+            data = {
+                'command': command,
+                'message': message
+            }
+            
+            try:
+                result = self.api_client.make_request('POST', f'/api/bot/users/{user_id}/interactions', data)
+                if not result.get('success', False):
+                    logger.warning(f"Error logging interaction: {result.get('error', 'Unknown error')}")
+            except Exception as e:
+                logger.warning(f"Error logging interaction: {e}")
+    
+    def close(self, timeout: float = 5.0):
+        """Svuota la coda delle interazioni e ferma il thread di scrittura (attesa massima: timeout)"""
+        try:
+            self._interaction_queue.put(None, timeout=timeout)
+        except queue.Full:
+            # Coda piena e writer bloccato su una richiesta lenta: le interazioni rimaste vanno perse
+            logger.warning("Interaction queue still full at shutdown, pending interactions dropped")
+            return
+        self._interaction_writer.join(timeout)
     
     def get_user_interactions(self, user_id: int, limit: int = 10) -> List[tuple]:
         """Ottiene le ultime interazioni di un utente tramite API"""
@@ -42,14 +119,7 @@ class DatabaseManager:
             raise Exception(f"Errore get user interactions: {result.get('error', 'Unknown error')}")
         
         # Converte il formato API in tupla come SQLite
-        interactions = []
-        for item in result.get('data', []):
-            interactions.append((
-                item.get('command'),
-                item.get('message'), 
-                item.get('timestamp')
-            ))
-        return interactions
+        return [tuple(map(item.get, _INTERACTION_FIELDS)) for item in result.get('data', [])]
     
     def update_user_activity(self, user_id: int):
         """Aggiorna l'ultima attività dell'utente tramite API"""
@@ -68,59 +138,46 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('POST', '/api/bot/categories', data)
+        self._cache_invalidate('categories')
         
-        if result.get('success'):
-            return True
-        elif 'already exists' in result.get('error', '').lower():
-            return False  # Categoria già esistente
-        else:
-            raise Exception(f"Errore add category: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'add category', 'already exists')
     
     def get_all_categories(self) -> List[tuple]:
         """Ottiene tutte le categorie tramite API"""
+        cached, version = self._cached('categories')
+        if cached is not None:
+            return list(cached)
+        
         result = self.api_client.make_request('GET', '/api/bot/categories')
         
         if not result.get('success', False):
             raise Exception(f"Errore get all categories: {result.get('error', 'Unknown error')}")
         
         # Converte il formato API in tupla come SQLite
-        categories = []
-        for item in result.get('data', []):
-            categories.append((
-                item.get('id'),
-                item.get('name'),
-                item.get('description'),
-                item.get('telegram_group_link'),
-                item.get('created_by'),
-                item.get('created_at')
-            ))
+        categories = [tuple(map(item.get, _CATEGORY_FIELDS)) for item in result.get('data', [])]
+        self._cache_store('categories', tuple(categories), version)
         return categories
     
     def delete_category(self, category_id: int) -> bool:
         """Elimina una categoria dal database tramite API"""
         result = self.api_client.make_request('DELETE', f'/api/bot/categories/{category_id}')
+        self._cache_invalidate('products')
+        self._cache_invalidate('categories')
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Categoria non trovata
-        else:
-            raise Exception(f"Errore delete category: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'delete category', 'not found')
     
     def get_category_by_id(self, category_id: int) -> Optional[tuple]:
         """Ottiene una categoria specifica per ID tramite API"""
+        # Lista categorie in cache completa: risponde anche per gli ID inesistenti (al più 30 secondi, vedi TTL)
+        cached, _ = self._cached('categories')
+        if cached is not None:
+            return next((category for category in cached if category[0] == category_id), None)
+        
         result = self.api_client.make_request('GET', f'/api/bot/categories/{category_id}')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
-                item.get('id'),
-                item.get('name'),
-                item.get('description'),
-                item.get('telegram_group_link'),
-                item.get('created_by'),
-                item.get('created_at')
-            )
+            return tuple(map(item.get, _CATEGORY_FIELDS))
         elif 'not found' in result.get('error', '').lower():
             return None  # Categoria non trovata
         else:
@@ -131,13 +188,9 @@ class DatabaseManager:
         data = {'telegram_link': telegram_link}
         
         result = self.api_client.make_request('PUT', f'/api/bot/categories/{category_id}/telegram-link', data)
+        self._cache_invalidate('categories')
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Categoria non trovata
-        else:
-            raise Exception(f"Errore update category telegram link: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update category telegram link', 'not found')
     
     # Metodi per gestire i prodotti
     def add_product(self, amazon_url: str, title: str = None, image_url: str = None, category_id: int = None, added_by: int = None) -> int:
@@ -151,6 +204,7 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('POST', '/api/bot/products', data)
+        self._cache_invalidate('products')
         
         if result.get('success'):
             return result.get('product_id', 0)
@@ -169,43 +223,31 @@ class DatabaseManager:
             return False  # Nessun dato da aggiornare
         
         result = self.api_client.make_request('PUT', f'/api/bot/products/{product_id}/details', data)
+        self._cache_invalidate('products')
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Prodotto non trovato
-        else:
-            raise Exception(f"Errore update product details: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update product details', 'not found')
     
     def update_product_category(self, product_id: int, category_id: int) -> bool:
         """Aggiorna la categoria di un prodotto tramite API"""
         data = {'category_id': category_id}
         
         result = self.api_client.make_request('PUT', f'/api/bot/products/{product_id}/category', data)
+        self._cache_invalidate('products')
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Prodotto non trovato
-        else:
-            raise Exception(f"Errore update product category: {result.get('error', 'Unknown error')}")
-    
+        return self._write_result(result, 'update product category', 'not found')
+
     def get_product_by_id(self, product_id: int) -> Optional[tuple]:
         """Ottiene un prodotto specifico per ID tramite API"""
+        # Prodotto presente nello snapshot in cache: nessuna richiesta; un ID assente viene verificato tramite API
+        cached, _ = self._cached('products')
+        if cached is not None and product_id in cached[1]:
+            return cached[1][product_id]
+        
         result = self.api_client.make_request('GET', f'/api/bot/products/{product_id}')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
-                item.get('id'),
-                item.get('amazon_url'),
-                item.get('title'),
-                item.get('image_url'),
-                item.get('category_id'),
-                item.get('added_by'),
-                item.get('created_at'),
-                item.get('category_name')
-            )
+            return tuple(map(item.get, _PRODUCT_FIELDS))
         elif 'not found' in result.get('error', '').lower():
             return None  # Prodotto non trovato
         else:
@@ -221,49 +263,32 @@ class DatabaseManager:
             raise Exception(f"Errore get products by category: {result.get('error', 'Unknown error')}")
         
         # Converte il formato API in tupla come SQLite
-        products = []
-        for item in result.get('data', []):
-            products.append((
-                item.get('id'),
-                item.get('amazon_url'),
-                item.get('title'),
-                item.get('added_by'),
-                item.get('created_at')
-            ))
-        return products
+        return [tuple(map(item.get, _CATEGORY_PRODUCT_FIELDS)) for item in result.get('data', [])]
     
     def get_all_products(self) -> List[tuple]:
         """Ottiene tutti i prodotti con informazioni categoria tramite API"""
+        cached, version = self._cached('products')
+        if cached is not None:
+            return list(cached[0])
+        
         result = self.api_client.make_request('GET', '/api/bot/products')
         
         if not result.get('success', False):
             raise Exception(f"Errore get all products: {result.get('error', 'Unknown error')}")
         
         # Converte il formato API in tupla come SQLite
-        products = []
-        for item in result.get('data', []):
-            products.append((
-                item.get('id'),
-                item.get('amazon_url'),
-                item.get('title'),
-                item.get('image_url'),
-                item.get('category_id'),
-                item.get('added_by'),
-                item.get('created_at'),
-                item.get('category_name')
-            ))
+        products = [tuple(map(item.get, _PRODUCT_FIELDS)) for item in result.get('data', [])]
+        
+        # Snapshot con indice per ID (salvato solo se nessuna scrittura è avvenuta durante la richiesta)
+        self._cache_store('products', (tuple(products), {product[0]: product for product in products}), version)
         return products
     
     def delete_product(self, product_id: int) -> bool:
         """Elimina un prodotto e tutti i suoi sconti associati tramite API"""
         result = self.api_client.make_request('DELETE', f'/api/bot/products/{product_id}')
+        self._cache_invalidate('products')
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Prodotto non trovato
-        else:
-            raise Exception(f"Errore delete product: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'delete product', 'not found')
     
     # Metodi per gestire gli sconti
     def add_product_discount(self, product_id: int, discount_percentage: int, original_price: str, 
@@ -318,17 +343,23 @@ class DatabaseManager:
     # Metodi per la configurazione cronjob
     def get_cronjob_config(self) -> Optional[tuple]:
         """Ottiene la configurazione del cronjob tramite API"""
+        cached, version = self._cached('cronjob')
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', '/api/config/cronjob')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
+            config = (
                 item.get('check_interval_minutes'),
                 item.get('product_delay_minutes'),
                 item.get('is_active'),
                 item.get('last_run'),
                 item.get('created_by')
             )
+            self._cache_store('cronjob', config, version)
+            return config
         else:
             return None  # Nessuna configurazione trovata
     
@@ -343,34 +374,36 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('PUT', '/api/config/cronjob', data)
+        self._cache_invalidate('cronjob')
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update cronjob config: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update cronjob config')
     
     def update_cronjob_last_run(self) -> bool:
         """Aggiorna il timestamp dell'ultima esecuzione del cronjob tramite API"""
         result = self.api_client.make_request('PUT', '/api/config/cronjob/last-run')
+        self._cache_invalidate('cronjob')  # last_run fa parte della configurazione
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update cronjob last run: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update cronjob last run')
     
     # Metodi per gestire il canale di approvazione
     def get_channel_config(self) -> Optional[tuple]:
         """Ottiene la configurazione del canale di approvazione tramite API"""
+        cached, version = self._cached('channel')
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', '/api/config/channel')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
+            config = (
                 item.get('channel_link'),
                 item.get('channel_id'),
                 item.get('is_active'),
                 item.get('created_by')
             )
+            self._cache_store('channel', config, version)
+            return config
         else:
             return None  # Nessuna configurazione trovata
     
@@ -385,11 +418,9 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('PUT', '/api/config/channel', data)
+        self._cache_invalidate('channel')
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update channel config: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update channel config')
     
     def add_approval_message(self, product_id: int, discount_id: int, 
                            channel_message_id: int, improved_message: str = None) -> int:
@@ -414,12 +445,7 @@ class DatabaseManager:
         
         result = self.api_client.make_request('PUT', f'/api/config/approval-messages/{approval_id}/approve', data)
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Messaggio non trovato
-        else:
-            raise Exception(f"Errore approve message: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'approve message', 'not found')
     
     def get_approval_by_message_id(self, channel_message_id: int) -> Optional[tuple]:
         """Ottiene un messaggio di approvazione per message_id tramite API"""
@@ -440,17 +466,23 @@ class DatabaseManager:
     # Metodi per gestire il prompt personalizzato OpenAI
     def get_openai_prompt_config(self):
         """Ottiene la configurazione del prompt OpenAI tramite API"""
+        cached, version = self._cached('openai_prompt')
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', '/api/config/openai-prompt')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
+            config = (
                 item.get('prompt_text'),
                 item.get('is_active'),
                 item.get('created_by'),
                 item.get('created_at'),
                 item.get('updated_at')
             )
+            self._cache_store('openai_prompt', config, version)
+            return config
         else:
             return None  # Nessuna configurazione trovata
     
@@ -462,26 +494,30 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('PUT', '/api/config/openai-prompt', data)
+        self._cache_invalidate('openai_prompt')
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update openai prompt config: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update openai prompt config')
     
     # Metodi per gestire lo slug Amazon affiliazione
     def get_amazon_affiliate_config(self):
         """Ottiene la configurazione dello slug Amazon tramite API"""
+        cached, version = self._cached('amazon_affiliate')
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', '/api/config/amazon-affiliate')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
+            config = (
                 item.get('affiliate_tag'),
                 item.get('is_active'),
                 item.get('created_by'),
                 item.get('created_at'),
                 item.get('updated_at')
             )
+            self._cache_store('amazon_affiliate', config, version)
+            return config
         else:
             return None  # Nessuna configurazione trovata
     
@@ -493,11 +529,9 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('PUT', '/api/config/amazon-affiliate', data)
+        self._cache_invalidate('amazon_affiliate')
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update amazon affiliate config: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update amazon affiliate config')
     
     # Metodi per gestire gli admin aggiuntivi
     def add_admin_user(self, user_id: int, username: str = None, first_name: str = None, 
@@ -512,24 +546,16 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('POST', '/api/bot/admin-users', data)
+        self._cache_invalidate(f'admin:{user_id}')
         
-        if result.get('success'):
-            return True
-        elif 'already exists' in result.get('error', '').lower():
-            return False  # L'utente è già admin
-        else:
-            raise Exception(f"Errore add admin user: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'add admin user', 'already exists')
     
     def remove_admin_user(self, user_id: int) -> bool:
         """Rimuove un admin dal database tramite API"""
         result = self.api_client.make_request('DELETE', f'/api/bot/admin-users/{user_id}')
+        self._cache_invalidate(f'admin:{user_id}')
         
-        if result.get('success'):
-            return True
-        elif 'not found' in result.get('error', '').lower():
-            return False  # Admin non trovato
-        else:
-            raise Exception(f"Errore remove admin user: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'remove admin user', 'not found')
     
     def get_all_admin_users(self) -> list:
         """Ottiene tutti gli admin aggiuntivi tramite API"""
@@ -538,25 +564,21 @@ class DatabaseManager:
         if not result.get('success', False):
             raise Exception(f"Errore get all admin users: {result.get('error', 'Unknown error')}")
         
-        admin_users = []
-        for item in result.get('data', []):
-            admin_users.append((
-                item.get('user_id'),
-                item.get('username'),
-                item.get('first_name'),
-                item.get('last_name'),
-                item.get('is_active'),
-                item.get('added_by'),
-                item.get('created_at')
-            ))
-        return admin_users
+        return [tuple(map(item.get, _ADMIN_USER_FIELDS)) for item in result.get('data', [])]
     
     def is_admin_user(self, user_id: int) -> bool:
-        """Controlla se un utente è admin aggiuntivo tramite API"""
+        """Controlla se un utente è admin aggiuntivo tramite API (esito in cache per al più 30 secondi)"""
+        key = f'admin:{user_id}'
+        cached, version = self._cached(key)
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', f'/api/bot/admin-users/{user_id}/check')
         
         if result.get('success'):
-            return result.get('is_admin', False)
+            is_admin = bool(result.get('is_admin', False))
+            self._cache_store(key, is_admin, version)
+            return is_admin
         else:
             raise Exception(f"Errore is admin user: {result.get('error', 'Unknown error')}")
     
@@ -583,16 +605,22 @@ class DatabaseManager:
     # Metodi per gestire l'approvazione automatica
     def get_auto_approval_config(self):
         """Ottiene la configurazione dell'approvazione automatica tramite API"""
+        cached, version = self._cached('auto_approval')
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', '/api/config/auto-approval')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
+            config = (
                 item.get('is_enabled'),
                 item.get('created_by'),
                 item.get('created_at'),
                 item.get('updated_at')
             )
+            self._cache_store('auto_approval', config, version)
+            return config
         else:
             return None  # Nessuna configurazione trovata
     
@@ -604,25 +632,29 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('PUT', '/api/config/auto-approval', data)
+        self._cache_invalidate('auto_approval')
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update auto approval config: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update auto approval config')
     
     def get_purchase_button_config(self):
         """Ottiene la configurazione del testo del pulsante di acquisto tramite API"""
+        cached, version = self._cached('purchase_button')
+        if cached is not None:
+            return cached
+        
         result = self.api_client.make_request('GET', '/api/config/purchase-button')
         
         if result.get('success') and result.get('data'):
             item = result['data']
-            return (
+            config = (
                 item.get('button_text'),
                 item.get('is_active'),
                 item.get('created_by'),
                 item.get('created_at'),
                 item.get('updated_at')
             )
+            self._cache_store('purchase_button', config, version)
+            return config
         else:
             return None  # Nessuna configurazione trovata
     
@@ -634,8 +666,6 @@ class DatabaseManager:
         }
         
         result = self.api_client.make_request('PUT', '/api/config/purchase-button', data)
+        self._cache_invalidate('purchase_button')
         
-        if result.get('success'):
-            return True
-        else:
-            raise Exception(f"Errore update purchase button config: {result.get('error', 'Unknown error')}")
+        return self._write_result(result, 'update purchase button config')
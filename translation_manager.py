@@ -1,7 +1,22 @@
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
+from datetime import datetime, timezone
+
+# Mappa per nomi di visualizzazione personalizzati
+_LANGUAGE_DISPLAY_NAMES = {
+    'Italian': '🇮🇹 Italiano',
+    'English': '🇺🇸 English',
+    'Spanish': '🇪🇸 Español',
+    'French': '🇫🇷 Français',
+    'German': '🇩🇪 Deutsch',
+    'Portuguese': '🇵🇹 Português',
+    'Russian': '🇷🇺 Русский',
+    'Chinese': '🇨🇳 中文',
+    'Japanese': '🇯🇵 日本語',
+    'Korean': '🇰🇷 한국어'
+}
 
 class TranslationManager:
     """Gestisce il sistema di traduzioni del bot"""
@@ -11,7 +26,9 @@ class TranslationManager:
         self.config_file = os.path.join(translations_dir, "config.json")
         self.current_language = "Italian"  # Default
         self.translations = {}
-        self.available_languages = []
+        self.available_languages: Tuple[str, ...] = ()
+        # Traduzioni già lette da disco, per lingua: il cambio lingua non rilegge il file
+        self._loaded_translations: Dict[str, Dict[str, str]] = {}
         
         # Inizializza il sistema
         self._load_config()
@@ -39,8 +56,11 @@ class TranslationManager:
                 "current_language": self.current_language,
                 "last_updated": self._get_current_timestamp()
             }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
+            # Scrittura su file temporaneo e rename atomico: un'interruzione non lascia config.json troncato
+            tmp_file = f"{self.config_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.config_file)
             logging.info(f"💾 Configurazione lingua salvata: {self.current_language}")
         except Exception as e:
             logging.error(f"❌ Errore salvataggio config lingua: {e}")
@@ -52,13 +72,13 @@ class TranslationManager:
                 os.makedirs(self.translations_dir, exist_ok=True)
                 logging.warning(f"📁 Cartella traduzioni creata: {self.translations_dir}")
             
-            self.available_languages = []
-            for filename in os.listdir(self.translations_dir):
-                if filename.endswith('.json') and filename != 'config.json':
-                    language_name = filename[:-5]  # Rimuove .json
-                    self.available_languages.append(language_name)
-            
-            self.available_languages.sort()
+            # Un solo scandir: i nomi arrivano con il tipo di file, senza stat separati
+            with os.scandir(self.translations_dir) as entries:
+                self.available_languages = tuple(sorted(
+                    entry.name[:-5]  # Rimuove .json
+                    for entry in entries
+                    if entry.name.endswith('.json') and entry.name != 'config.json' and entry.is_file()
+                ))
             logging.info(f"🌐 Lingue disponibili: {self.available_languages}")
             
         except Exception as e:
@@ -66,12 +86,18 @@ class TranslationManager:
     
     def _load_current_translations(self):
         """Carica le traduzioni per la lingua corrente"""
+        cached = self._loaded_translations.get(self.current_language)
+        if cached is not None:
+            self.translations = cached
+            return
+        
         try:
             language_file = os.path.join(self.translations_dir, f"{self.current_language}.json")
             
             if os.path.exists(language_file):
                 with open(language_file, 'r', encoding='utf-8') as f:
                     self.translations = json.load(f)
+                self._loaded_translations[self.current_language] = self.translations
                 logging.info(f"📚 Traduzioni caricate per: {self.current_language}")
             else:
                 logging.error(f"❌ File traduzioni non trovato: {language_file}")
@@ -81,9 +107,9 @@ class TranslationManager:
             logging.error(f"❌ Errore caricamento traduzioni: {e}")
             self.translations = {}
     
-    def get_available_languages(self) -> List[str]:
-        """Restituisce l'elenco delle lingue disponibili"""
-        return self.available_languages.copy()
+    def get_available_languages(self) -> Tuple[str, ...]:
+        """Restituisce l'elenco delle lingue disponibili (tupla immutabile, condivisa senza copie)"""
+        return self.available_languages
     
     def get_current_language(self) -> str:
         """Restituisce la lingua corrente"""
@@ -112,47 +138,31 @@ class TranslationManager:
         Returns:
             Testo tradotto o la chiave se non trovata
         """
-        try:
-            text = self.translations.get(key, key)
-            
-            # Applica il formatting se ci sono parametri
-            if kwargs:
-                text = text.format(**kwargs)
-            
+        text = self.translations.get(key, key)
+        if not kwargs:
             return text
-            
-        except Exception as e:
+        
+        # Applica il formatting dei parametri
+        try:
+            return text.format(**kwargs)
+        except (KeyError, IndexError, ValueError) as e:
             logging.error(f"❌ Errore get_text per chiave '{key}': {e}")
             return key
     
     def reload_translations(self):
         """Ricarica le traduzioni (utile se i file vengono modificati)"""
+        self._loaded_translations.clear()
         self._load_available_languages()
         self._load_current_translations()
         logging.info("🔄 Traduzioni ricaricate")
     
     def _get_current_timestamp(self) -> str:
-        """Restituisce il timestamp corrente in formato ISO"""
-        from datetime import datetime
-        return datetime.now().isoformat() + 'Z'
+        """Restituisce il timestamp corrente UTC in formato ISO"""
+        return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
     
     def get_language_display_name(self, language: str) -> str:
         """Restituisce il nome di visualizzazione per una lingua"""
-        # Mappa per nomi di visualizzazione personalizzati
-        display_names = {
-            'Italian': '🇮🇹 Italiano',
-            'English': '🇺🇸 English',
-            'Spanish': '🇪🇸 Español',
-            'French': '🇫🇷 Français',
-            'German': '🇩🇪 Deutsch',
-            'Portuguese': '🇵🇹 Português',
-            'Russian': '🇷🇺 Русский',
-            'Chinese': '🇨🇳 中文',
-            'Japanese': '🇯🇵 日本語',
-            'Korean': '🇰🇷 한국어'
-        }
-        
-        return display_names.get(language, f"🌐 {language}")
+        return _LANGUAGE_DISPLAY_NAMES.get(language, f"🌐 {language}")
     
     def has_translation(self, key: str) -> bool:
         """Controlla se esiste una traduzione per la chiave specificata"""